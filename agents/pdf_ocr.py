@@ -0,0 +1,247 @@
+"""
+PDF OCR - Selective page OCR for the PDF/OCR agent
+Finds the pages whose text layer is missing, rasterizes only those at a
+configurable DPI and runs Tesseract on them in worker processes, then
+merges the recognized text back into the document in page order
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Sequence
+
+from pdf_ocr_cache import OCRCache, file_hash, image_hash
+from pdf_text import PAGE_SEPARATOR, join_pages, _import_pymupdf
+
+OCR_DPI = 300
+# Pages with fewer extracted characters than this (a bare page number, say) count as image-only
+MIN_TEXT_CHARS = 16
+OCR_MODES = ['auto', 'all']
+
+
+def pages_needing_ocr(pdf_path: str, pages: List[Dict[str, Any]], min_chars: int = MIN_TEXT_CHARS,
+                      mode: str = 'auto') -> Dict[str, List[int]]:
+    """Split 1-based page numbers into {'ocr', 'text', 'blank'}
+    
+    pages are the entries from pdf_text.extract_pages. In auto mode pages
+    with a usable text layer are kept as they are, and pages with neither
+    text nor images are skipped without rendering.
+    """
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown OCR mode: {mode}")
+    if mode == 'all':
+        return {'ocr': [page['page'] for page in pages], 'text': [], 'blank': []}
+    
+    groups = {'ocr': [], 'text': [], 'blank': []}
+    thin = []
+    for page in pages:
+        (groups['text'] if page['chars'] >= min_chars else thin).append(page['page'])
+    if not thin:
+        return groups
+    
+    try:
+        pymupdf = _import_pymupdf()
+    except ImportError:
+        # Without PyMuPDF there is no cheap image check; OCR every thin page
+        groups['ocr'] = thin
+        return groups
+    
+    with pymupdf.open(pdf_path) as doc:
+        for number in thin:
+            page = doc[number - 1]
+            # Vector-drawn scans are rare; images are what carry scanned text
+            if page.get_images(full=False):
+                groups['ocr'].append(number)
+            else:
+                groups['blank'].append(number)
+    return groups
+
+
+def render_page(pdf_path: str, page_number: int, dpi: int = OCR_DPI):
+    """Rasterize one 1-based page to a grayscale uint8 array"""
+    import numpy as np
+    
+    try:
+        pymupdf = _import_pymupdf()
+    except ImportError:
+        from pdf2image import convert_from_path
+        image = convert_from_path(pdf_path, dpi=dpi, first_page=page_number,
+                                  last_page=page_number, grayscale=True)[0]
+        return np.asarray(image.convert('L'))
+    
+    with pymupdf.open(pdf_path) as doc:
+        pixmap = doc[page_number - 1].get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY, alpha=False)
+        # Rows are padded to the stride; copy so the array outlives the pixmap
+        pixels = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)
+        return pixels[:, :pixmap.width].copy()
+
+
+def ocr_image(image, language: str = 'eng+jpn') -> str:
+    """Run Tesseract on a grayscale array or PIL image"""
+    import pytesseract
+    return pytesseract.image_to_string(image, lang=language)
+
+
+def check_tesseract():
+    """Raise RuntimeError unless pytesseract and the tesseract binary are usable"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except ImportError:
+        raise RuntimeError("OCR requires the pytesseract package") from None
+    except Exception as e:
+        raise RuntimeError(f"OCR requires a Tesseract installation: {e}") from None
+
+
+# Per-process handles on the OCR cache, opened on first use in each worker
+_worker_caches: Dict[str, OCRCache] = {}
+
+
+def _init_ocr_worker(preprocessing: Sequence[str] = ()):
+    """Keep Tesseract (and OpenCV) single-threaded; the pool provides the parallelism"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    if preprocessing:
+        from pdf_ocr_preprocess import init_worker
+        init_worker()
+
+
+def _worker_cache(path: str) -> OCRCache:
+    if path not in _worker_caches:
+        _worker_caches[path] = OCRCache(path)
+    return _worker_caches[path]
+
+
+def ocr_page(pdf_path: str, page_number: int, language: str, dpi: int,
+             cache_path: str = None, preprocessing: Sequence[str] = ()) -> Dict[str, Any]:
+    """Render, preprocess and recognize one page
+    
+    Returns {'page', 'text', 'seconds', 'image_key', 'cached'}. With a
+    cache_path the rendered pixels are looked up first, so a page seen
+    before in any file skips preprocessing and Tesseract.
+    """
+    started = time.perf_counter()
+    image = render_page(pdf_path, page_number, dpi)
+    image_key = None
+    text = None
+    if cache_path:
+        image_key = OCRCache.key(image_hash(image), language, dpi, _signature(preprocessing))
+        text = _worker_cache(cache_path).get(image_key, count=False)
+    cached = text is not None
+    if not cached:
+        if preprocessing:
+            from pdf_ocr_preprocess import get_preprocessor
+            # The worker's preprocessor reuses its buffers from page to page
+            image = get_preprocessor(preprocessing).run(image)
+        text = ocr_image(image, language)
+    return {
+        'page': page_number,
+        'text': text,
+        'seconds': round(time.perf_counter() - started, 3),
+        'image_key': image_key,
+        'cached': cached
+    }
+
+
+def _signature(preprocessing: Sequence[str]) -> List[str]:
+    if not preprocessing:
+        return []
+    from pdf_ocr_preprocess import preprocess_signature
+    return preprocess_signature(preprocessing)
+
+
+def ocr_pages(pdf_path: str, page_numbers: List[int], language: str = 'eng+jpn',
+              dpi: int = OCR_DPI, workers: Optional[int] = None,
+              cache: OCRCache = None, preprocessing: Sequence[str] = ()) -> Dict[str, Any]:
+    """OCR the given pages, one per task in a process pool
+    
+    Returns {'texts': {page: text}, 'errors': {page: message}, 'error',
+    'seconds', 'cached_pages'}; a page that fails is reported without
+    failing the others, and error is set when Tesseract is unusable. With
+    a cache, pages are looked up by file hash and page number before
+    anything is rendered, and by rendered pixels in the workers.
+    preprocessing names pdf_ocr_preprocess steps run on each page before
+    Tesseract; they are part of every cache key.
+    """
+    texts: Dict[int, str] = {}
+    errors: Dict[int, str] = {}
+    file_keys: Dict[int, str] = {}
+    cached_pages: List[int] = []
+    seconds = 0.0
+    
+    pending = list(page_numbers)
+    if cache:
+        source = file_hash(pdf_path)
+        pending = []
+        for number in page_numbers:
+            file_keys[number] = OCRCache.key(f'{source}:{number}', language, dpi, _signature(preprocessing))
+            text = cache.get(file_keys[number], count=False)
+            if text is None:
+                pending.append(number)
+            else:
+                cache.record(hit=True)
+                texts[number] = text
+                cached_pages.append(number)
+    
+    def collect(page_number: int, run):
+        nonlocal seconds
+        try:
+            page = run()
+        except Exception as e:
+            errors[page_number] = str(e)
+            return
+        texts[page_number] = page['text']
+        seconds += page['seconds']
+        if cache:
+            cache.record(hit=page['cached'])
+            if page['cached']:
+                cached_pages.append(page_number)
+            else:
+                cache.put(page['image_key'], page['text'])
+            cache.put(file_keys[page_number], page['text'])
+    
+    # Cached pages need no Tesseract, but a cold page would fail in every worker
+    error = None
+    if pending:
+        try:
+            check_tesseract()
+        except RuntimeError as e:
+            error = str(e)
+            if cache:
+                for _ in pending:
+                    cache.record(hit=False)
+            pending = []
+    
+    cache_path = cache.path if cache else None
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers == 1:
+        for number in pending:
+            collect(number, lambda: ocr_page(pdf_path, number, language, dpi, cache_path, preprocessing))
+    elif workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                 initargs=(tuple(preprocessing),)) as executor:
+            futures = {executor.submit(ocr_page, pdf_path, number, language, dpi, cache_path, preprocessing): number
+                       for number in pending}
+            for future in as_completed(futures):
+                collect(futures[future], future.result)
+    
+    return {
+        'texts': texts,
+        'errors': errors,
+        'error': error,
+        'seconds': round(seconds, 3),
+        'cached_pages': sorted(cached_pages)
+    }
+
+
+def merge_ocr_text(extraction: Dict[str, Any], ocr_texts: Dict[int, str]) -> Dict[str, Any]:
+    """Replace the text of OCR'd pages and rebuild the document offsets in page order"""
+    text = extraction['text']
+    page_texts = [text[page['start']:page['end']] for page in extraction['pages']]
+    for number, ocr_text in ocr_texts.items():
+        # Form feeds would break the page separation
+        page_texts[number - 1] = ocr_text.replace(PAGE_SEPARATOR, '\n').strip()
+    
+    merged = join_pages(page_texts, extraction.get('engine'))
+    for page in merged['pages']:
+        page['source'] = 'ocr' if page['page'] in ocr_texts else 'text'
+    return merged
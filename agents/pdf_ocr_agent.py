@@ -7,12 +7,16 @@ Handles PDF text extraction, table extraction, image extraction, and OCR
 import json
 import sys
 import os
-import re
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 import base64
 from io import BytesIO
 
+from pdf_ocr import OCR_DPI, MIN_TEXT_CHARS, pages_needing_ocr, ocr_image, ocr_pages, merge_ocr_text, check_tesseract
+from pdf_ocr_cache import OCRCache, file_hash
+from pdf_text import extract_pages, join_pages, page_count, resolve_engine
+from pdf_trailer import read_pdf_trailer, PDFTrailerError
+
 # Note: In production, these would be installed via requirements.txt
 # For now, we'll implement basic functionality that can be extended
 
@@ -23,8 +27,17 @@ class PDFOCRAgent:
         self.config = config or {}
         self.results = []
         self.temp_dir = 'temp_pdf_processing'
+        self._last_trailer = (None, None)
         os.makedirs(self.temp_dir, exist_ok=True)
         
+        # Recognized text survives between runs, keyed by source hash and OCR settings
+        self.ocr_cache = None
+        if self.config.get('ocr_cache_dir'):
+            self.ocr_cache = OCRCache(
+                os.path.join(self.config['ocr_cache_dir'], 'ocr_cache.sqlite'),
+                max_bytes=int(self.config.get('ocr_cache_max_mb', 256)) * 1024 * 1024
+            )
+    
     def process_pdf(self, pdf_path: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
         """Process a PDF file"""
         options = options or {}
@@ -45,22 +58,34 @@ class PDFOCRAgent:
                     raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
             # Extract various components
+            extraction = self._extract_text(pdf_path)
+            
+            # OCR only the pages without a usable text layer
+            if options.get('perform_ocr', False):
+                try:
+                    ocr = self._perform_ocr(pdf_path, options.get('ocr_language', 'eng+jpn'), extraction, options)
+                    extraction = ocr.pop('extraction', extraction)
+                except Exception as e:
+                    # Pages of a locked or damaged file cannot be rendered either
+                    ocr = {'error': str(e)}
+                result['ocr'] = ocr
+            
             result.update({
                 'metadata': self._extract_metadata(pdf_path),
-                'text': self._extract_text(pdf_path),
+                'text': extraction['text'],
+                'pages': extraction['pages'],
+                'text_engine': extraction['engine'],
                 'tables': self._extract_tables(pdf_path),
                 'images': self._extract_images(pdf_path, options.get('extract_images', False)),
                 'structure': self._analyze_structure(pdf_path),
                 'page_count': self._get_page_count(pdf_path),
                 'status': 'completed'
             })
-            
-            # Perform OCR if needed
-            if options.get('perform_ocr', False):
-                result['ocr_text'] = self._perform_ocr(pdf_path, options.get('ocr_language', 'eng+jpn'))
+            if extraction.get('error'):
+                result['text_error'] = extraction['error']
             
             return result
-            
+        
         except Exception as e:
             return {
                 'file': pdf_path,
@@ -84,10 +109,24 @@ class PDFOCRAgent:
         
         return filename
     
+    def _read_trailer(self, pdf_path: str) -> Optional[Dict[str, Any]]:
+        """Version, page count, Info and encryption from the xref/trailer, or None
+        
+        The last file's result is kept, since metadata, structure and page
+        count all ask for the same file in turn.
+        """
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+        if self._last_trailer[0] != key:
+            try:
+                trailer = read_pdf_trailer(pdf_path)
+            except (PDFTrailerError, OSError):
+                trailer = None
+            self._last_trailer = (key, trailer)
+        return self._last_trailer[1]
+    
     def _extract_metadata(self, pdf_path: str) -> Dict[str, Any]:
         """Extract PDF metadata"""
-        # Simplified metadata extraction
-        # In production, would use PyPDF2 or pdfplumber
         metadata = {
             'filename': os.path.basename(pdf_path),
             'size_bytes': os.path.getsize(pdf_path),
@@ -95,23 +134,31 @@ class PDFOCRAgent:
             'modified': datetime.fromtimestamp(os.path.getmtime(pdf_path)).isoformat()
         }
         
+        trailer = self._read_trailer(pdf_path)
+        if trailer:
+            metadata.update({
+                'pdf_version': trailer['version'],
+                'encrypted': trailer['encrypted'],
+                'info': trailer['info']
+            })
+        
         return metadata
     
-    def _extract_text(self, pdf_path: str) -> str:
-        """Extract text from PDF"""
-        # Simplified text extraction
-        # In production, would use PyMuPDF or pdfplumber
+    def _extract_text(self, pdf_path: str) -> Dict[str, Any]:
+        """Extract text page by page; returns {'text', 'pages', 'engine'}
+        
+        pages gives each page's start/end offsets into text. Long documents
+        are split across text_workers processes (default: one per core).
+        When no engine is installed or the file cannot be opened (a user
+        password, damaged data) the text is empty and 'error' says why, so
+        metadata, trailer and page count are still reported.
+        """
         try:
-            # This is a placeholder - actual implementation would use PDF libraries
-            with open(pdf_path, 'rb') as f:
-                content = f.read()
-                # Basic text pattern matching (very simplified)
-                text_pattern = rb'[\x20-\x7E]+'
-                matches = re.findall(text_pattern, content)
-                text = b' '.join(matches).decode('utf-8', errors='ignore')
-                return text[:10000]  # Limit to first 10000 chars
-        except:
-            return "Text extraction requires PyMuPDF or similar library"
+            return extract_pages(pdf_path,
+                                 workers=self.config.get('text_workers'),
+                                 engine=self.config.get('text_engine', 'auto'))
+        except Exception as e:
+            return {'text': '', 'pages': [], 'engine': None, 'error': str(e)}
     
     def _extract_tables(self, pdf_path: str) -> List[Dict[str, Any]]:
         """Extract tables from PDF"""
@@ -160,7 +207,7 @@ class PDFOCRAgent:
             'has_toc': False,
             'has_forms': False,
             'has_annotations': False,
-            'is_encrypted': False,
+            'is_encrypted': bool((self._read_trailer(pdf_path) or {}).get('encrypted')),
             'is_signed': False,
             'sections': [],
             'note': 'Full structure analysis requires PDF parsing libraries'
@@ -169,18 +216,58 @@ class PDFOCRAgent:
         return structure
     
     def _get_page_count(self, pdf_path: str) -> int:
-        """Get PDF page count"""
-        # Simplified - in production would use PyPDF2
-        # This is a rough estimate based on file size
-        file_size = os.path.getsize(pdf_path)
-        estimated_pages = max(1, file_size // 50000)  # Rough estimate
-        return estimated_pages
+        """Get PDF page count from the page tree root"""
+        trailer = self._read_trailer(pdf_path)
+        if trailer and trailer['page_count'] is not None:
+            return trailer['page_count']
+        
+        # Damaged cross-reference data: let the text engine repair and count
+        try:
+            return page_count(pdf_path, resolve_engine(self.config.get('text_engine', 'auto')))
+        except Exception:
+            return 0
     
-    def _perform_ocr(self, pdf_path: str, language: str = 'eng') -> str:
-        """Perform OCR on PDF"""
-        # Placeholder for OCR
-        # In production, would use Tesseract OCR
-        return f"OCR requires Tesseract installation. Language setting: {language}"
+    def _perform_ocr(self, pdf_path: str, language: str = 'eng', extraction: Dict[str, Any] = None,
+                     options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Perform OCR on the pages of a PDF that have no text layer
+        
+        Returns a summary of which pages were OCR'd, kept or skipped as
+        blank; under 'extraction' it carries the document text with the OCR
+        text merged in page order. ocr_mode 'all' OCRs every page.
+        """
+        options = options or {}
+        extraction = extraction or self._extract_text(pdf_path)
+        if not extraction['pages']:
+            # No text engine: every page is a candidate
+            extraction = join_pages([''] * self._get_page_count(pdf_path), extraction.get('engine'))
+        
+        dpi = int(options.get('ocr_dpi', self.config.get('ocr_dpi', OCR_DPI)))
+        mode = options.get('ocr_mode', self.config.get('ocr_mode', 'auto'))
+        groups = pages_needing_ocr(pdf_path, extraction['pages'],
+                                   self.config.get('min_text_chars', MIN_TEXT_CHARS), mode)
+        summary = {
+            'language': language,
+            'dpi': dpi,
+            'mode': mode,
+            'pages_ocr': groups['ocr'],
+            'pages_text_layer': len(groups['text']),
+            'pages_blank': len(groups['blank'])
+        }
+        if not groups['ocr']:
+            return summary
+        
+        preprocessing = self._preprocessing_steps()
+        summary['preprocessing'] = preprocessing
+        ocr = ocr_pages(pdf_path, groups['ocr'], language, dpi, self.config.get('ocr_workers'),
+                        self.ocr_cache, preprocessing)
+        summary['ocr_seconds'] = ocr['seconds']
+        summary['pages_cached'] = ocr['cached_pages']
+        if ocr['error']:
+            summary['error'] = ocr['error']
+        elif ocr['errors']:
+            summary['page_errors'] = ocr['errors']
+        summary['extraction'] = merge_ocr_text(extraction, ocr['texts'])
+        return summary
     
     def process_image_ocr(self, image_path: str, language: str = 'eng+jpn') -> Dict[str, Any]:
         """Perform OCR on an image file"""
@@ -196,16 +283,36 @@ class PDFOCRAgent:
             if not os.path.exists(image_path):
                 raise FileNotFoundError(f"Image file not found: {image_path}")
             
-            # Placeholder for OCR processing
+            preprocessing = self._preprocessing_steps()
+            signature = []
+            if preprocessing:
+                from pdf_ocr_preprocess import get_preprocessor, preprocess_signature
+                signature = preprocess_signature(preprocessing)
+            key = OCRCache.key(file_hash(image_path), language, 0, signature) if self.ocr_cache else None
+            text = self.ocr_cache.get(key) if key else None
+            cached = text is not None
+            if not cached:
+                check_tesseract()
+                image = self._load_image(image_path)
+                if preprocessing:
+                    preprocessor = get_preprocessor(preprocessing)
+                    image = preprocessor.run(image)
+                    result['skew_angle'] = round(preprocessor.last_angle, 2)
+                text = ocr_image(image, language)
+                if key:
+                    self.ocr_cache.put(key, text)
+            
             result.update({
-                'text': f"OCR text would be extracted here using Tesseract with language: {language}",
-                'confidence': 0.0,
-                'preprocessing': ['deskew', 'denoise', 'binarize'],
+                'text': text,
+                'cached': cached,
+                'preprocessing': preprocessing,
                 'status': 'completed'
             })
+            if extraction.get('error'):
+                result['text_error'] = extraction['error']
             
             return result
-            
+        
         except Exception as e:
             return {
                 'file': image_path,
@@ -214,6 +321,28 @@ class PDFOCRAgent:
                 'status': 'failed'
             }
     
+    def _preprocessing_steps(self) -> List[str]:
+        """Configured preprocessing steps in run order; none when OpenCV is missing"""
+        steps = self.config.get('ocr_preprocessing', ['deskew', 'denoise', 'binarize'])
+        if not steps:
+            return []
+        try:
+            from pdf_ocr_preprocess import normalize_steps
+        except ImportError:
+            return []
+        return normalize_steps(steps)
+    
+    def _load_image(self, image_path: str):
+        """Read an image file as a grayscale uint8 array"""
+        import cv2
+        import numpy as np
+        
+        # imdecode copes with non-ASCII paths, which imread does not on every platform
+        image = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Unreadable image file: {image_path}")
+        return image
+    
     def process_batch(self, files: List[str], options: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Process multiple files"""
         results = []
@@ -287,6 +416,9 @@ class PDFOCRAgent:
             'processing_time': datetime.now().isoformat()
         }
         
+        if self.ocr_cache:
+            summary['ocr_cache'] = self.ocr_cache.get_stats()
+        
         return summary
 
 
@@ -297,7 +429,17 @@ def main():
         'input_files': os.environ.get('INPUT_FILES', '').split(','),
         'perform_ocr': os.environ.get('PERFORM_OCR', 'false').lower() == 'true',
         'ocr_language': os.environ.get('OCR_LANGUAGE', 'eng+jpn'),
-        'extract_images': os.environ.get('EXTRACT_IMAGES', 'false').lower() == 'true'
+        'extract_images': os.environ.get('EXTRACT_IMAGES', 'false').lower() == 'true',
+        'text_workers': int(os.environ.get('PDF_TEXT_WORKERS', '0')) or None,
+        'text_engine': os.environ.get('PDF_TEXT_ENGINE', 'auto'),
+        'ocr_dpi': int(os.environ.get('OCR_DPI', '300')),
+        'ocr_mode': os.environ.get('OCR_MODE', 'auto'),
+        'ocr_workers': int(os.environ.get('OCR_WORKERS', '0')) or None,
+        'ocr_cache_dir': os.environ.get('OCR_CACHE_DIR', '.cache/pdf-ocr'),
+        'ocr_cache_max_mb': int(os.environ.get('OCR_CACHE_MAX_MB', '256')),
+        'ocr_preprocessing': [step.strip() for step in
+                              os.environ.get('OCR_PREPROCESSING', 'deskew,denoise,binarize').split(',')
+                              if step.strip() and step.strip() != 'none']
     }
     
     # Command line arguments override
@@ -335,6 +477,8 @@ def main():
     print(f"Failed: {summary['failed']}")
     print(f"Total pages: {summary['total_pages']}")
     print(f"Total text characters: {summary['total_text_chars']}")
+    if 'ocr_cache' in summary:
+        print(f"OCR cache: {summary['ocr_cache']['hits']} hits, {summary['ocr_cache']['misses']} misses")
     print(f"Results saved to: {output_info['json_file']}")
     
     # Return results for GitHub Actions
@@ -0,0 +1,131 @@
+"""
+PDF OCR Cache - Persistent OCR results for the PDF/OCR agent
+Stores recognized text in SQLite keyed by a hash of the source (file or
+rendered page pixels) together with the language, DPI and preprocessing
+settings, evicting the least recently used entries beyond a size budget
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, Sequence
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_hash(pixels) -> str:
+    """sha256 of a rendered page: its shape plus raw pixel bytes"""
+    digest = hashlib.sha256(repr(pixels.shape).encode('ascii'))
+    digest.update(pixels.tobytes())
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """Size-bounded on-disk OCR text cache with LRU eviction"""
+    
+    def __init__(self, path: str = '.cache/pdf-ocr/ocr_cache.sqlite',
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # OCR worker processes read the same database while the agent writes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                key TEXT PRIMARY KEY,
+                text TEXT,
+                size INTEGER,
+                last_access REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_ocr_access ON ocr_results (last_access)')
+        self._conn.commit()
+    
+    @staticmethod
+    def key(source_hash: str, language: str, dpi: int, preprocessing: Sequence[str] = ()) -> str:
+        """Cache key for a source hash under the given OCR settings"""
+        settings = json.dumps([source_hash, language, dpi, list(preprocessing)])
+        return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str, count: bool = True) -> Optional[str]:
+        """Return the cached text for a key, or None
+        
+        Pass count=False when the lookup is only the first of several for
+        one page and the outcome is recorded later.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT text FROM ocr_results WHERE key = ?', (key,)).fetchone()
+            if row:
+                self._conn.execute('UPDATE ocr_results SET last_access = ? WHERE key = ?', (time.time(), key))
+                self._conn.commit()
+            if count:
+                self.stats['hits' if row else 'misses'] += 1
+        return row[0] if row else None
+    
+    def put(self, key: str, text: str):
+        """Store recognized text"""
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?)',
+                (key, text, size, time.time())
+            )
+            self.stats['stores'] += 1
+            self._evict()
+            self._conn.commit()
+    
+    def record(self, hit: bool):
+        """Count a lookup answered elsewhere (such as in an OCR worker)"""
+        with self._lock:
+            self.stats['hits' if hit else 'misses'] += 1
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        rows = self._conn.execute('SELECT key, size FROM ocr_results ORDER BY last_access').fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM ocr_results WHERE key = ?', (key,))
+            total -= size
+            self.stats['evictions'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results'
+            ).fetchone()
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'entries': entries,
+            'size_bytes': size,
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0
+        })
+        return stats
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,228 @@
+"""
+PDF OCR Preprocess - Page image cleanup before OCR for the PDF/OCR agent
+Deskews pages by projection-profile search, removes speckle noise and
+binarizes with an adaptive threshold using NumPy and OpenCV, reusing work
+buffers per process so batches of pages run without reallocating
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Steps always run in this order, whatever order they are listed in
+PREPROCESS_STEPS = ['deskew', 'denoise', 'binarize']
+MAX_SKEW_DEGREES = 5.0
+# Skew is estimated on a copy scaled down by a whole factor to at most this width;
+# line spacing survives the scaling and integer factors take OpenCV's fast path
+SKEW_SAMPLE_WIDTH = 1024
+# A strided sample of ink pixels this large pins the angle as well as all of them
+SKEW_MAX_INK_PIXELS = 60000
+# Rotations smaller than this change nothing Tesseract can see
+MIN_SKEW_DEGREES = 0.1
+DENOISE_KERNEL = 3
+# Neighbourhood (pixels, odd) and offset for the adaptive threshold, suited to ~300 DPI text.
+# The local mean is a box filter, constant cost per pixel unlike a 31x31 Gaussian
+BINARIZE_BLOCK = 31
+BINARIZE_OFFSET = 15
+
+
+def normalize_steps(steps: Sequence[str]) -> List[str]:
+    """Validate preprocessing step names and put them in execution order"""
+    unknown = set(steps) - set(PREPROCESS_STEPS)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing steps: {', '.join(sorted(unknown))}")
+    return [step for step in PREPROCESS_STEPS if step in steps]
+
+
+def preprocess_signature(steps: Sequence[str]) -> List[str]:
+    """Steps with their parameters, for cache keys; changes whenever the output would"""
+    params = {
+        'deskew': f'deskew:{MAX_SKEW_DEGREES:g}',
+        'denoise': f'denoise:{DENOISE_KERNEL}',
+        'binarize': f'binarize:mean:{BINARIZE_BLOCK}:{BINARIZE_OFFSET}'
+    }
+    return [params[step] for step in normalize_steps(steps)]
+
+
+def _profile_scores(xs: np.ndarray, ys: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    """Sharpness of the row projection of ink pixels sheared by each angle
+    
+    Shearing by tan(angle) stands in for rotation at these small angles, so
+    every candidate is one vectorized bincount instead of an image rotation.
+    """
+    tans = np.tan(np.radians(angles))
+    shift = int(np.ceil(np.abs(tans).max() * (xs.max() + 1))) + 1
+    bins = int(ys.max()) + 2 * shift + 1
+    rows = np.rint(ys[None, :] - xs[None, :] * tans[:, None]).astype(np.int64) + shift
+    rows += (np.arange(len(angles)) * bins)[:, None]
+    profiles = np.bincount(rows.ravel(), minlength=len(angles) * bins).reshape(len(angles), bins)
+    # Aligned text lines concentrate ink in few rows: the sum of squares peaks
+    return (profiles.astype(np.float64) ** 2).sum(axis=1)
+
+
+def estimate_skew(gray: np.ndarray, max_angle: float = MAX_SKEW_DEGREES) -> float:
+    """Angle in degrees by which the text lines of a page slope down to the right"""
+    height, width = gray.shape
+    factor = -(-width // SKEW_SAMPLE_WIDTH)
+    small = gray
+    if factor > 1:
+        small = cv2.resize(gray, (width // factor, max(1, height // factor)), interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > SKEW_MAX_INK_PIXELS:
+        stride = len(ys) // SKEW_MAX_INK_PIXELS + 1
+        ys, xs = ys[::stride], xs[::stride]
+    
+    # Coarse sweep, then refine around the best coarse angle
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 0.5)
+    best = coarse[np.argmax(_profile_scores(xs, ys, coarse))]
+    fine = np.arange(best - 0.5, best + 0.5 + 1e-9, 0.05)
+    return float(fine[np.argmax(_profile_scores(xs, ys, fine))])
+
+
+class Preprocessor:
+    """Runs the enabled steps on one page at a time, reusing its work buffers
+    
+    The array returned by run() is one of those buffers and is overwritten
+    by the next call; copy it to keep it.
+    """
+    
+    def __init__(self, steps: Sequence[str] = PREPROCESS_STEPS):
+        self.steps = normalize_steps(steps)
+        self.last_angle = 0.0
+        self._buffers: Dict[str, np.ndarray] = {}
+    
+    def _buffer(self, name: str, shape: Tuple[int, int]) -> np.ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype=np.uint8)
+        return buffer
+    
+    def run(self, image: np.ndarray) -> np.ndarray:
+        """Preprocess one grayscale (or BGR) page image"""
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._buffer('gray', image.shape[:2]))
+        shape = image.shape
+        
+        self.last_angle = 0.0
+        if 'deskew' in self.steps:
+            angle = estimate_skew(image)
+            if abs(angle) >= MIN_SKEW_DEGREES:
+                self.last_angle = angle
+                center = (shape[1] / 2, shape[0] / 2)
+                matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+                image = cv2.warpAffine(image, matrix, (shape[1], shape[0]), dst=self._buffer('deskew', shape),
+                                       flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+        
+        if 'denoise' in self.steps:
+            image = cv2.medianBlur(image, DENOISE_KERNEL, dst=self._buffer('denoise', shape))
+        
+        if 'binarize' in self.steps:
+            image = cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                          BINARIZE_BLOCK, BINARIZE_OFFSET, dst=self._buffer('binarize', shape))
+        return image
+
+
+# One Preprocessor per process and step list, so every page a worker handles reuses its buffers
+_preprocessors: Dict[Tuple[str, ...], Preprocessor] = {}
+
+
+def get_preprocessor(steps: Sequence[str]) -> Preprocessor:
+    """This process's shared Preprocessor for a step list"""
+    key = tuple(normalize_steps(steps))
+    if key not in _preprocessors:
+        _preprocessors[key] = Preprocessor(key)
+    return _preprocessors[key]
+
+
+def init_worker():
+    """Keep OpenCV single-threaded in worker processes; the pool provides the parallelism"""
+    cv2.setNumThreads(1)
+
+
+def _preprocess_chunk(images: List[np.ndarray], steps: Sequence[str]) -> List[np.ndarray]:
+    preprocessor = get_preprocessor(steps)
+    return [preprocessor.run(image).copy() for image in images]
+
+
+def preprocess_batch(images: List[np.ndarray], steps: Sequence[str] = PREPROCESS_STEPS,
+                     workers: int = None, chunk_pages: int = 4) -> List[np.ndarray]:
+    """Preprocess a batch of page images in order, in worker processes when workers > 1"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(images) <= chunk_pages:
+        return _preprocess_chunk(images, steps)
+    
+    chunks = [images[start:start + chunk_pages] for start in range(0, len(images), chunk_pages)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=init_worker) as executor:
+        results = executor.map(_preprocess_chunk, chunks, [steps] * len(chunks))
+        return [image for chunk in results for image in chunk]
+
+
+def synthetic_page(seed: int, size: Tuple[int, int] = (3508, 2480), max_angle: float = 3.0):
+    """A noisy, skewed A4 page of text lines at 300 DPI; returns (image, skew angle)"""
+    rng = np.random.default_rng(seed)
+    height, width = size
+    page = np.full(size, 255, dtype=np.uint8)
+    for y in range(250, height - 250, 70):
+        words = ' '.join(''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz'), rng.integers(2, 9)))
+                         for _ in range(9))
+        cv2.putText(page, words, (200, y), cv2.FONT_HERSHEY_SIMPLEX, 1.6, 0, 3, cv2.LINE_AA)
+    
+    angle = float(rng.uniform(-max_angle, max_angle))
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+    page = cv2.warpAffine(page, matrix, (width, height), borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    # Scanner grain plus salt-and-pepper speckle
+    page = np.clip(page.astype(np.int16) + rng.normal(0, 12, size).astype(np.int16), 0, 255).astype(np.uint8)
+    speckle = rng.random(size)
+    page[speckle < 0.002] = 0
+    page[speckle > 0.998] = 255
+    return page, angle
+
+
+def benchmark(pages: int = 16, workers: int = None, size: Tuple[int, int] = (3508, 2480)) -> Dict[str, Any]:
+    """Pages per second for each step and for whole batches, on synthetic 300 DPI pages"""
+    samples = [synthetic_page(seed, size) for seed in range(pages)]
+    images = [image for image, _ in samples]
+    report = {'pages': pages, 'size': list(size), 'steps': {}}
+    
+    for step in PREPROCESS_STEPS:
+        preprocessor = Preprocessor([step])
+        preprocessor.run(images[0])
+        started = time.perf_counter()
+        for image in images:
+            preprocessor.run(image)
+        report['steps'][step] = round(pages / (time.perf_counter() - started), 2)
+    
+    errors = [abs(estimate_skew(image) - angle) for image, angle in samples]
+    report['skew_error_degrees'] = {'mean': round(float(np.mean(errors)), 3), 'max': round(float(np.max(errors)), 3)}
+    
+    for label, count in (('single_process', 1), ('workers', workers or os.cpu_count() or 1)):
+        started = time.perf_counter()
+        preprocess_batch(images, workers=count)
+        report[label] = {'workers': count, 'pages_per_second': round(pages / (time.perf_counter() - started), 2)}
+    return report
+
+
+def main():
+    """Print the preprocessing benchmark: python pdf_ocr_preprocess.py [pages] [workers]"""
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    report = benchmark(pages, workers)
+    
+    print(f"=== Preprocessing benchmark: {pages} pages at {report['size'][1]}x{report['size'][0]} ===")
+    for step, rate in report['steps'].items():
+        print(f"{step}: {rate} pages/s")
+    print(f"Skew error: mean {report['skew_error_degrees']['mean']} deg, max {report['skew_error_degrees']['max']} deg")
+    print(f"All steps, 1 process: {report['single_process']['pages_per_second']} pages/s")
+    print(f"All steps, {report['workers']['workers']} workers: {report['workers']['pages_per_second']} pages/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+PDF Text - Page-parallel text extraction for the PDF/OCR agent
+Reads the text layer with PyMuPDF (or pdfplumber when PyMuPDF is missing),
+splitting long documents into page ranges that worker processes extract
+independently, and returns the document text with per-page offsets
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+# Pages are joined with a form feed, as pdftotext does
+PAGE_SEPARATOR = '\f'
+# Below this many pages per worker, process start-up costs more than it saves
+MIN_PAGES_PER_WORKER = 16
+TEXT_ENGINES = ['pymupdf', 'pdfplumber']
+
+
+def _import_pymupdf():
+    try:
+        import pymupdf
+    except ImportError:
+        # PyMuPDF < 1.24 only ships the fitz name
+        import fitz as pymupdf
+    return pymupdf
+
+
+def resolve_engine(engine: str = 'auto') -> str:
+    """Return the text engine to use, raising ImportError if none is installed"""
+    candidates = TEXT_ENGINES if engine == 'auto' else [engine]
+    for candidate in candidates:
+        try:
+            if candidate == 'pymupdf':
+                _import_pymupdf()
+            elif candidate == 'pdfplumber':
+                import pdfplumber  # noqa: F401
+            else:
+                raise ValueError(f"Unknown text engine: {candidate}")
+            return candidate
+        except ImportError:
+            continue
+    raise ImportError("Text extraction requires PyMuPDF or pdfplumber")
+
+
+def page_count(pdf_path: str, engine: str) -> int:
+    """Number of pages, opening the document with the given engine"""
+    if engine == 'pymupdf':
+        with _import_pymupdf().open(pdf_path) as doc:
+            if doc.needs_pass:
+                raise PermissionError(f"PDF is password protected: {pdf_path}")
+            return doc.page_count
+    
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(pdf_path: str, engine: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) (0-based), opening the document once"""
+    texts = []
+    if engine == 'pymupdf':
+        with _import_pymupdf().open(pdf_path) as doc:
+            for number in range(start, stop):
+                texts.append(doc[number].get_text('text'))
+        return texts
+    
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            texts.append(page.extract_text() or '')
+            # pdfplumber keeps parsed objects on the page until flushed
+            page.flush_cache()
+    return texts
+
+
+def _page_ranges(pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, a few per worker for load balancing"""
+    chunks = min(workers * 4, max(1, pages // MIN_PAGES_PER_WORKER))
+    size = -(-pages // chunks)
+    return [(start, min(start + size, pages)) for start in range(0, pages, size)]
+
+
+def extract_pages(pdf_path: str, workers: Optional[int] = None, engine: str = 'auto',
+                  executor: ProcessPoolExecutor = None) -> Dict[str, Any]:
+    """Extract the text layer of every page
+    
+    Returns {'text', 'pages', 'engine'} where text is the whole document
+    with pages separated by PAGE_SEPARATOR and pages holds
+    {'page', 'start', 'end', 'chars'} entries giving each page's slice of
+    text (1-based page numbers). Documents longer than
+    MIN_PAGES_PER_WORKER pages are split across worker processes; pass an
+    executor to reuse one pool for a whole batch.
+    """
+    engine = resolve_engine(engine)
+    pages = page_count(pdf_path, engine)
+    workers = workers or os.cpu_count() or 1
+    
+    if workers <= 1 or pages < MIN_PAGES_PER_WORKER * 2:
+        texts = extract_page_range(pdf_path, engine, 0, pages)
+    else:
+        ranges = _page_ranges(pages, workers)
+        own_pool = executor is None
+        pool = executor or ProcessPoolExecutor(max_workers=min(workers, len(ranges)))
+        try:
+            futures = [pool.submit(extract_page_range, pdf_path, engine, start, stop)
+                       for start, stop in ranges]
+            texts = [text for future in futures for text in future.result()]
+        finally:
+            if own_pool:
+                pool.shutdown()
+    
+    return join_pages(texts, engine)
+
+
+def join_pages(texts: List[str], engine: str = None) -> Dict[str, Any]:
+    """Join per-page texts into one document with per-page offsets"""
+    entries = []
+    offset = 0
+    for number, text in enumerate(texts, 1):
+        entries.append({'page': number, 'start': offset, 'end': offset + len(text), 'chars': len(text)})
+        offset += len(text) + len(PAGE_SEPARATOR)
+    return {
+        'text': PAGE_SEPARATOR.join(texts),
+        'pages': entries,
+        'engine': engine
+    }
@@ -0,0 +1,532 @@
+"""
+PDF Trailer - Header, xref and trailer reader for the PDF/OCR agent
+Reads a PDF's version, page count, Info dictionary and encryption flag from
+the header, the cross-reference sections (tables or streams, following
+/Prev chains) and the handful of objects they point at, without touching
+page content, so whole batches can be triaged in milliseconds per file
+"""
+
+import mmap
+import re
+import zlib
+from collections import namedtuple
+from typing import Dict, Any, List, Optional, Tuple
+
+WHITESPACE = b'\x00\t\n\x0c\r '
+DELIMITERS = b'()<>[]{}/%'
+# startxref must sit within the last 1 KiB per the spec; allow for trailing junk
+TAIL_BYTES = 64 * 1024
+HEADER_RE = re.compile(rb'%PDF-(\d\.\d)')
+STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+OBJ_HEADER_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj\b')
+NUMBER_RE = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+REF_TAIL_RE = re.compile(rb'\s+(\d+)\s+R(?=[\s/<>\[\]()%]|$)')
+XREF_SUBSECTION_RE = re.compile(rb'(\d+)\s+(\d+)')
+XREF_ENTRY_RE = re.compile(rb'\s*(\d{1,10})\s+(\d{1,5})\s+([nf])')
+XREF_FIXED_RE = re.compile(rb'(\d{10}) (\d{5}) ([nf])[\r\n ]{2}')
+XREF_ENTRY_SIZE = 20
+# Writers often get offsets slightly wrong; look this far around them for "N G obj"
+OFFSET_SLACK = 1024
+MAX_PREV_SECTIONS = 256
+INFO_DATE_KEYS = ('CreationDate', 'ModDate')
+LITERAL_ESCAPES = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b',
+                   ord('f'): b'\f', ord('('): b'(', ord(')'): b')', ord('\\'): b'\\'}
+
+PDFRef = namedtuple('PDFRef', ['num', 'gen'])
+
+
+class PDFTrailerError(ValueError):
+    """The file's cross-reference data could not be read without repairing it"""
+
+
+class _Stream:
+    """A stream object: its dictionary plus the raw (still encoded) data"""
+    __slots__ = ('dict', 'data')
+    
+    def __init__(self, dictionary: Dict[str, Any], data: bytes):
+        self.dict = dictionary
+        self.data = data
+
+
+def _skip_space(data, pos: int) -> int:
+    size = len(data)
+    while pos < size:
+        byte = data[pos]
+        if byte in WHITESPACE:
+            pos += 1
+        elif byte == 0x25:  # % comment runs to end of line
+            while pos < size and data[pos] not in b'\r\n':
+                pos += 1
+        else:
+            break
+    return pos
+
+
+def _parse_literal(data, pos: int) -> Tuple[bytes, int]:
+    """Parse a (literal string) starting just after the opening parenthesis"""
+    out = bytearray()
+    depth = 1
+    while pos < len(data):
+        byte = data[pos]
+        pos += 1
+        if byte == 0x5C:  # backslash
+            escaped = data[pos]
+            pos += 1
+            if escaped in LITERAL_ESCAPES:
+                out += LITERAL_ESCAPES[escaped]
+            elif 0x30 <= escaped <= 0x37:
+                digits = bytes([escaped])
+                while len(digits) < 3 and 0x30 <= data[pos] <= 0x37:
+                    digits += bytes([data[pos]])
+                    pos += 1
+                out.append(int(digits, 8) & 0xFF)
+            elif escaped == 0x0D:
+                # Line continuation
+                if data[pos] == 0x0A:
+                    pos += 1
+            elif escaped != 0x0A:
+                out.append(escaped)
+        elif byte == 0x28:
+            depth += 1
+            out.append(byte)
+        elif byte == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), pos
+            out.append(byte)
+        else:
+            out.append(byte)
+    raise PDFTrailerError("Unterminated string")
+
+
+def _parse_name(data, pos: int) -> Tuple[str, int]:
+    """Parse a /Name starting just after the slash"""
+    end = pos
+    while end < len(data) and data[end] not in WHITESPACE and data[end] not in DELIMITERS:
+        end += 1
+    raw = bytes(data[pos:end])
+    if b'#' in raw:
+        raw = re.sub(rb'#([0-9A-Fa-f]{2})', lambda m: bytes([int(m.group(1), 16)]), raw)
+    return raw.decode('latin-1'), end
+
+
+def parse_object(data, pos: int) -> Tuple[Any, int]:
+    """Parse one PDF object at pos; return (value, position after it)
+    
+    Names become str, strings bytes, indirect references PDFRef and
+    dictionaries dict keyed by name without the slash.
+    """
+    pos = _skip_space(data, pos)
+    if pos >= len(data):
+        raise PDFTrailerError("Unexpected end of data")
+    byte = data[pos]
+    
+    if byte == 0x3C:  # <
+        if data[pos + 1] == 0x3C:
+            result = {}
+            pos += 2
+            while True:
+                pos = _skip_space(data, pos)
+                if data[pos:pos + 2] == b'>>':
+                    return result, pos + 2
+                if data[pos] != 0x2F:
+                    raise PDFTrailerError(f"Expected a name key at offset {pos}")
+                key, pos = _parse_name(data, pos + 1)
+                result[key], pos = parse_object(data, pos)
+        end = data.find(b'>', pos)
+        if end < 0:
+            raise PDFTrailerError("Unterminated hex string")
+        digits = re.sub(rb'\s', b'', bytes(data[pos + 1:end]))
+        if len(digits) % 2:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii')), end + 1
+    
+    if byte == 0x5B:  # [
+        result = []
+        pos += 1
+        while True:
+            pos = _skip_space(data, pos)
+            if data[pos] == 0x5D:
+                return result, pos + 1
+            value, pos = parse_object(data, pos)
+            result.append(value)
+    
+    if byte == 0x28:
+        return _parse_literal(data, pos + 1)
+    
+    if byte == 0x2F:
+        return _parse_name(data, pos + 1)
+    
+    match = NUMBER_RE.match(data, pos)
+    if match:
+        token = match.group(0)
+        if b'.' in token:
+            return float(token), match.end()
+        # "12 0 R" is a reference, not two integers
+        ref = REF_TAIL_RE.match(data, match.end())
+        if ref:
+            return PDFRef(int(token), int(ref.group(1))), ref.end()
+        return int(token), match.end()
+    
+    for keyword, value in ((b'true', True), (b'false', False), (b'null', None)):
+        if data[pos:pos + len(keyword)] == keyword:
+            return value, pos + len(keyword)
+    raise PDFTrailerError(f"Unexpected token at offset {pos}")
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    """Undo PNG row predictors (Predictor >= 10) with one byte per pixel"""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data) - row_size + 1, row_size):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        for i in range(columns):
+            left = row[i - 1] if i else 0
+            up = previous[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                upper_left = previous[i - 1] if i else 0
+                estimate = left + up - upper_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - upper_left))
+                row[i] = (row[i] + (left, up, upper_left)[distances.index(min(distances))]) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+
+class PDFTrailerReader:
+    """Random access to the objects named by a PDF's cross-reference data"""
+    
+    def __init__(self, data):
+        self.data = data
+        self.trailer: Dict[str, Any] = {}
+        self.xref_kind = None
+        # One (subsections, hybrid xref stream subsections) pair per xref section, newest first
+        self._sections: List[Tuple[List[Tuple], List[Tuple]]] = []
+        self._object_streams: Dict[int, Tuple[bytes, List[Tuple[int, int]]]] = {}
+        self._read_xref_chain()
+    
+    def _read_xref_chain(self):
+        tail_start = max(0, len(self.data) - TAIL_BYTES)
+        matches = list(STARTXREF_RE.finditer(self.data, tail_start))
+        if not matches:
+            raise PDFTrailerError("No startxref found")
+        offset = int(matches[-1].group(1))
+        
+        visited = set()
+        while offset is not None and offset not in visited:
+            if len(visited) >= MAX_PREV_SECTIONS:
+                raise PDFTrailerError("Too many /Prev sections")
+            visited.add(offset)
+            trailer = self._read_xref_section(offset)
+            # Newer sections are read first, so their keys win
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            offset = trailer.get('Prev')
+        if 'Root' not in self.trailer:
+            raise PDFTrailerError("Trailer has no /Root")
+    
+    def _read_xref_section(self, offset: int) -> Dict[str, Any]:
+        pos = _skip_space(self.data, offset)
+        if self.data[pos:pos + 4] == b'xref':
+            self.xref_kind = self.xref_kind or 'table'
+            subsections, trailer = self._read_xref_table(pos + 4)
+            hybrid = []
+            if isinstance(trailer.get('XRefStm'), int):
+                # Hybrid file: objects in object streams are listed in an extra xref stream
+                hybrid, _ = self._read_xref_stream(trailer['XRefStm'])
+            self._sections.append((subsections, hybrid))
+            return trailer
+        self.xref_kind = self.xref_kind or 'stream'
+        subsections, trailer = self._read_xref_stream(offset)
+        self._sections.append((subsections, []))
+        return trailer
+    
+    def _read_xref_table(self, pos: int) -> Tuple[List[Tuple], Dict[str, Any]]:
+        """Locate the subsections of an xref table; entries are parsed on lookup"""
+        data = self.data
+        subsections = []
+        while True:
+            pos = _skip_space(data, pos)
+            if data[pos:pos + 7] == b'trailer':
+                trailer, _ = parse_object(data, pos + 7)
+                return subsections, trailer
+            header = XREF_SUBSECTION_RE.match(data, pos)
+            if not header:
+                raise PDFTrailerError(f"Malformed xref table at offset {pos}")
+            first, count = int(header.group(1)), int(header.group(2))
+            pos = _skip_space(data, header.end())
+            
+            # Entries are meant to be exactly 20 bytes; check the last one lines up
+            end = pos + XREF_ENTRY_SIZE * count
+            if count and XREF_FIXED_RE.match(data, end - XREF_ENTRY_SIZE):
+                subsections.append(('table', first, count, pos))
+                pos = end
+                continue
+            
+            # Sloppy writers: parse this subsection entry by entry
+            entries = {}
+            for number in range(first, first + count):
+                entry = XREF_ENTRY_RE.match(data, pos)
+                if not entry:
+                    raise PDFTrailerError(f"Malformed xref entry at offset {pos}")
+                pos = entry.end()
+                entries[number] = self._table_entry(entry)
+            subsections.append(('parsed', entries))
+    
+    def _read_xref_stream(self, offset: int) -> Tuple[List[Tuple], Dict[str, Any]]:
+        """Decode an xref stream and locate its subsections; entries are parsed on lookup"""
+        stream = self._object_at(offset)
+        if not isinstance(stream, _Stream) or stream.dict.get('Type') != 'XRef':
+            raise PDFTrailerError(f"No xref table or stream at offset {offset}")
+        widths = stream.dict['W']
+        size = stream.dict.get('Size', 0)
+        index = stream.dict.get('Index', [0, size])
+        data = self._decode(stream)
+        row = sum(widths)
+        
+        subsections = []
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            count = min(count, (len(data) - pos) // row)
+            subsections.append(('stream', first, count, pos, data, widths))
+            pos += row * count
+        return subsections, stream.dict
+    
+    @staticmethod
+    def _table_entry(match) -> Tuple:
+        if match.group(3) == b'n':
+            return ('offset', int(match.group(1)), int(match.group(2)))
+        return ('free',)
+    
+    def _lookup(self, subsections: List[Tuple], number: int) -> Optional[Tuple]:
+        for subsection in subsections:
+            if subsection[0] == 'parsed':
+                if number in subsection[1]:
+                    return subsection[1][number]
+                continue
+            first, count, pos = subsection[1:4]
+            if not first <= number < first + count:
+                continue
+            if subsection[0] == 'table':
+                match = XREF_FIXED_RE.match(self.data, pos + XREF_ENTRY_SIZE * (number - first))
+                return self._table_entry(match) if match else None
+            
+            data, widths = subsection[4:]
+            pos += sum(widths) * (number - first)
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(data[pos:pos + width], 'big'))
+                pos += width
+            kind = fields[0] if widths[0] else 1
+            if kind == 1:
+                return ('offset', fields[1], fields[2])
+            if kind == 2:
+                return ('compressed', fields[1], fields[2])
+            return ('free',)
+        return None
+    
+    def entry(self, number: int) -> Optional[Tuple]:
+        """The newest xref entry for an object number"""
+        for subsections, hybrid in self._sections:
+            entry = self._lookup(subsections, number)
+            if hybrid and (entry is None or entry[0] == 'free'):
+                entry = self._lookup(hybrid, number) or entry
+            if entry is not None:
+                return entry
+        return None
+    
+    def _decode(self, stream: _Stream) -> bytes:
+        filters = stream.dict.get('Filter')
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        params = stream.dict.get('DecodeParms') or {}
+        params = params[0] if isinstance(params, list) and params else params
+        data = stream.data
+        for name in filters:
+            if name != 'FlateDecode':
+                raise PDFTrailerError(f"Unsupported filter /{name}")
+            try:
+                data = zlib.decompress(data)
+            except zlib.error:
+                # Encrypted object streams and truncated data both end up here
+                raise PDFTrailerError("Could not inflate stream") from None
+        if isinstance(params, dict) and params.get('Predictor', 1) >= 10:
+            data = _png_unpredict(data, params.get('Columns', 1))
+        return data
+    
+    def _object_at(self, offset: int, number: int = None) -> Any:
+        """Parse the indirect object whose "N G obj" header is at (or near) offset"""
+        match = OBJ_HEADER_RE.match(self.data, _skip_space(self.data, offset))
+        if not match or (number is not None and int(match.group(1)) != number):
+            if number is None:
+                raise PDFTrailerError(f"No object at offset {offset}")
+            # Take the header for this object number closest to the stated offset
+            pattern = re.compile(rb'(?<!\d)%d\s+\d+\s+obj\b' % number)
+            window_start = max(0, offset - OFFSET_SLACK)
+            candidates = list(pattern.finditer(self.data, window_start, offset + OFFSET_SLACK))
+            if not candidates:
+                raise PDFTrailerError(f"Object {number} not found near offset {offset}")
+            match = min(candidates, key=lambda candidate: abs(candidate.start() - offset))
+        value, pos = parse_object(self.data, match.end())
+        
+        pos = _skip_space(self.data, pos)
+        if isinstance(value, dict) and self.data[pos:pos + 6] == b'stream':
+            pos += 6
+            if self.data[pos:pos + 2] == b'\r\n':
+                pos += 2
+            elif self.data[pos:pos + 1] in (b'\n', b'\r'):
+                pos += 1
+            length = value.get('Length')
+            if isinstance(length, PDFRef):
+                length = self.resolve(length)
+            if not isinstance(length, int):
+                end = self.data.find(b'endstream', pos)
+                length = end - pos if end >= 0 else 0
+            return _Stream(value, bytes(self.data[pos:pos + length]))
+        return value
+    
+    def _compressed_object(self, stream_number: int, index: int) -> Any:
+        if stream_number not in self._object_streams:
+            stream = self.resolve(PDFRef(stream_number, 0))
+            if not isinstance(stream, _Stream):
+                raise PDFTrailerError(f"Object {stream_number} is not an object stream")
+            data = self._decode(stream)
+            header = data[:stream.dict['First']].split()
+            offsets = [(int(number), stream.dict['First'] + int(offset))
+                       for number, offset in zip(header[::2], header[1::2])]
+            self._object_streams[stream_number] = (data, offsets)
+        data, offsets = self._object_streams[stream_number]
+        value, _ = parse_object(data, offsets[index][1])
+        return value
+    
+    def resolve(self, value: Any, depth: int = 0) -> Any:
+        """Follow indirect references until a direct object is reached"""
+        while isinstance(value, PDFRef):
+            depth += 1
+            if depth > 32:
+                raise PDFTrailerError("Reference chain too deep")
+            entry = self.entry(value.num)
+            if entry is None or entry[0] == 'free':
+                return None
+            if entry[0] == 'offset':
+                value = self._object_at(entry[1], value.num)
+            else:
+                value = self._compressed_object(entry[1], entry[2])
+        return value
+    
+    def page_count(self) -> int:
+        catalog = self.resolve(self.trailer['Root'])
+        pages = self.resolve(catalog.get('Pages')) if isinstance(catalog, dict) else None
+        count = self.resolve(pages.get('Count')) if isinstance(pages, dict) else None
+        if not isinstance(count, int):
+            raise PDFTrailerError("Page tree has no /Count")
+        return count
+    
+    def catalog_version(self) -> Optional[str]:
+        catalog = self.resolve(self.trailer['Root'])
+        version = catalog.get('Version') if isinstance(catalog, dict) else None
+        return version if isinstance(version, str) else None
+    
+    def info(self) -> Dict[str, Any]:
+        info = self.resolve(self.trailer.get('Info'))
+        if not isinstance(info, dict):
+            return {}
+        return {key: _info_value(self.resolve(value), key) for key, value in info.items()}
+
+
+def decode_text_string(raw: bytes) -> str:
+    """Decode a PDF text string (UTF-16 with BOM, UTF-8 with BOM or PDFDocEncoding)"""
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='replace')
+    if raw.startswith(b'\xff\xfe'):
+        return raw[2:].decode('utf-16-le', errors='replace')
+    if raw.startswith(b'\xef\xbb\xbf'):
+        return raw[3:].decode('utf-8', errors='replace')
+    # PDFDocEncoding matches Latin-1 for everything but a few symbols
+    return raw.decode('latin-1')
+
+
+def parse_pdf_date(value: str) -> Optional[str]:
+    """Convert D:YYYYMMDDHHmmSSOHH'mm' to ISO 8601, or None if it does not parse"""
+    match = re.match(r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?([Zz+-])?(\d{2})?'?(\d{2})?", value)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, sign, tz_hour, tz_minute = match.groups()
+    iso = f"{year}-{month or '01'}-{day or '01'}T{hour or '00'}:{minute or '00'}:{second or '00'}"
+    if sign in ('Z', 'z'):
+        iso += '+00:00'
+    elif sign:
+        iso += f"{sign}{tz_hour or '00'}:{tz_minute or '00'}"
+    return iso
+
+
+def _info_value(value: Any, key: str) -> Any:
+    if isinstance(value, bytes):
+        text = decode_text_string(value)
+        if key in INFO_DATE_KEYS:
+            return parse_pdf_date(text) or text
+        return text
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _guarded(func, *args):
+    """Call func, reporting malformed data as PDFTrailerError"""
+    try:
+        return func(*args)
+    except PDFTrailerError:
+        raise
+    except (IndexError, KeyError, TypeError, ValueError) as e:
+        raise PDFTrailerError(f"Malformed cross-reference data: {e}") from e
+
+
+def read_pdf_trailer(pdf_path: str) -> Dict[str, Any]:
+    """Return {'version', 'page_count', 'info', 'encrypted', 'xref'} for a PDF
+    
+    Only the header, the cross-reference sections and the catalog, page
+    tree root and Info objects are read. Info is left empty for encrypted
+    files, whose strings cannot be read without the key, and page_count is
+    None when an encrypted file keeps its catalog in an object stream.
+    Raises PDFTrailerError when the file would need repairing first.
+    """
+    with open(pdf_path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise PDFTrailerError(f"Empty file: {pdf_path}") from None
+    
+    try:
+        header = HEADER_RE.search(data, 0, 1024)
+        if not header:
+            raise PDFTrailerError(f"Not a PDF file: {pdf_path}")
+        reader = _guarded(PDFTrailerReader, data)
+        encrypted = reader.trailer.get('Encrypt') is not None
+        version = header.group(1).decode('ascii')
+        count = None
+        try:
+            catalog_version = _guarded(reader.catalog_version)
+            # The catalog may raise the version of an incrementally updated file
+            if catalog_version and catalog_version > version:
+                version = catalog_version
+            count = _guarded(reader.page_count)
+        except PDFTrailerError:
+            # Object streams of encrypted files cannot be inflated without the key
+            if not encrypted:
+                raise
+        return {
+            'version': version,
+            'page_count': count,
+            'info': {} if encrypted else _guarded(reader.info),
+            'encrypted': encrypted,
+            'xref': reader.xref_kind
+        }
+    finally:
+        data.close()
@@ -7,13 +7,283 @@ Supports static sites, SPAs, and JavaScript-heavy sites
 import json
 import sys
 import os
-import re
+import codecs
+import hashlib
+import itertools
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from urllib.parse import urlparse, urljoin
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
+from bs4.builder import builder_registry
+import soupsieve
+try:
+    # Private, but lets one matcher be reused for a whole document; see SelectorPlan
+    from soupsieve.css_match import CSSMatch
+except ImportError:
+    CSSMatch = None
 import csv
+import xml.etree.ElementTree as ET
+
+from scraping_archive import ResponseArchive
+from scraping_cache import ResponseCache, ExtractionStore
+from scraping_charset import CharsetResolver, header_charset
+from scraping_columnar import ColumnarExporter
+from scraping_frontier import CrawlFrontier
+from scraping_index import load_index, write_index
+from scraping_records import BaseURL, LinkRecord, ImageRecord, json_default
+from scraping_robots import RobotsCache, iter_sitemap
+from scraping_scheduler import HostScheduler
+from scraping_tables import table_to_frame, frame_to_view
+from scraping_timing import TimingCollector, stage_timer
+
+# Strings that BeautifulSoup.get_text() treats as page text
+TEXT_STRING_TYPES = (NavigableString, CData)
+# Response types worth parsing; anything else is skipped before download
+ALLOWED_CONTENT_TYPES = ['text/html', 'application/xhtml+xml', 'application/xml', 'text/xml', 'text/plain']
+DEFAULT_MAX_BODY_BYTES = 20 * 1024 * 1024
+# Fields the incremental parser can produce without building a tree
+INCREMENTAL_FIELDS = {'title', 'text'}
+
+# Fields scrape_url can return; options['fields'] selects a subset
+STANDARD_FIELDS = ['title', 'meta', 'headers', 'text', 'links', 'images',
+                   'tables', 'forms', 'scripts', 'structured_data']
+HEADER_LEVELS = {f'h{level}': level for level in range(1, 7)}
+
+# Tree builders in order of preference; html.parser ships with Python
+PARSER_BACKENDS = ['lxml', 'html.parser', 'html5lib']
+
+# Columns of the per-run CSV summary
+SUMMARY_FIELDS = ['url', 'title', 'status_code', 'text_length', 'links_count', 'images_count']
+
+
+def summary_row(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the CSV summary row for a scraping result"""
+    return {
+        'url': result.get('url', ''),
+        'title': result.get('title', ''),
+        'status_code': result.get('status_code', ''),
+        'text_length': len(result.get('text', '')),
+        'links_count': len(result.get('links', [])),
+        'images_count': len(result.get('images', []))
+    }
+
+
+class IncrementalTextParser(HTMLParser):
+    """Collect title and page text from streamed HTML chunks
+    
+    Lets a download stop as soon as the title is known and the text
+    budget is filled, without building a full tree.
+    """
+    
+    def __init__(self, text_budget: int = 10000):
+        super().__init__(convert_charrefs=True)
+        self.text_budget = text_budget
+        self.title = None
+        self.text_parts = []
+        self.body_started = False
+        self._title_parts = None
+        self._skip_depth = 0
+        self._raw_length = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip_depth += 1
+        elif tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'body':
+            self.body_started = True
+    
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+    
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        self.text_parts.append(data)
+        self._raw_length += len(data)
+    
+    def satisfied(self, normalize: Callable[[str, int], str]) -> bool:
+        """Whether the title is settled and the normalized text fills the budget"""
+        if self.title is None and not self.body_started:
+            return False
+        if self._raw_length < self.text_budget:
+            return False
+        return len(normalize(''.join(self.text_parts), self.text_budget)) >= self.text_budget
+
+
+class SelectorPlan:
+    """Custom CSS selectors compiled once and evaluated together in one traversal
+    
+    Each selector spec is either a selector string or a dict with
+    'selector', optional 'first' (stop after the first match) and optional
+    'attr' (return that attribute instead of the element text).
+    """
+    
+    def __init__(self, selectors: Dict[str, Any]):
+        self.rules = []
+        for key, spec in selectors.items():
+            if isinstance(spec, str):
+                spec = {'selector': spec}
+            self.rules.append({
+                'key': key,
+                'matcher': soupsieve.compile(spec['selector']),
+                'first': bool(spec.get('first', False)),
+                'attr': spec.get('attr')
+            })
+    
+    def evaluate(self, soup: BeautifulSoup) -> Dict[str, Any]:
+        """Run every selector over the tree, stopping once only satisfied first-match rules remain"""
+        matches = {rule['key']: [] for rule in self.rules}
+        active = [(rule, self._bind(rule['matcher'], soup)) for rule in self.rules]
+        
+        for element in soup.descendants:
+            if not active:
+                break
+            if not isinstance(element, Tag):
+                continue
+            
+            satisfied = False
+            for rule, match in active:
+                if not match(element):
+                    continue
+                value = self._value(element, rule['attr'])
+                if value is None:
+                    continue
+                matches[rule['key']].append(value)
+                if rule['first']:
+                    satisfied = True
+            
+            if satisfied:
+                active = [(rule, match) for rule, match in active
+                          if not (rule['first'] and matches[rule['key']])]
+        
+        custom_data = {}
+        for rule in self.rules:
+            values = matches[rule['key']]
+            if values:
+                custom_data[rule['key']] = values[0] if rule['first'] or len(values) == 1 else values
+        return custom_data
+    
+    @staticmethod
+    def _bind(compiled, soup: BeautifulSoup) -> Callable[[Tag], bool]:
+        """A match(element) function for one compiled selector on this document
+        
+        SoupSieve.match() rebuilds its matcher on every call, so where the
+        installed soupsieve still has the CSSMatch class that select() uses
+        internally, one is bound per document; otherwise the public match().
+        """
+        if CSSMatch is not None:
+            try:
+                return CSSMatch(compiled.selectors, soup, compiled.namespaces, compiled.flags).match
+            except (TypeError, AttributeError):
+                pass
+        return compiled.match
+    
+    def _value(self, element: Tag, attr: Optional[str]) -> Optional[str]:
+        """Read the text or requested attribute of a matched element"""
+        if not attr:
+            return element.get_text().strip()
+        value = element.get(attr)
+        if isinstance(value, list):
+            value = ' '.join(value)
+        return value
+
+
+class StreamingResultWriter:
+    """Write scraping results to JSONL and CSV files as they are produced
+    
+    Every file of one writer is named {prefix}_<kind>_<timestamp>, so runs
+    with different prefixes in the same directory never collide.
+    """
+    
+    def __init__(self, output_dir: str = 'outputs/scraping', prefix: str = 'scraped_data',
+                 columnar_format: Optional[str] = None):
+        os.makedirs(output_dir, exist_ok=True)
+        
+        self._claim_files(output_dir, prefix, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        self.count = 0
+        self._lock = threading.Lock()
+        
+        self._csv_writer = csv.DictWriter(self._csv_handle, fieldnames=SUMMARY_FIELDS)
+        self._csv_writer.writeheader()
+        self.columnar = None
+        if columnar_format:
+            self.columnar = ColumnarExporter(output_dir, self.timestamp, columnar_format, prefix=prefix)
+    
+    def _claim_files(self, output_dir: str, prefix: str, timestamp: str):
+        """Create the JSONL and CSV files exclusively, numbering the stamp on a collision
+        
+        Two runs in the same second (back-to-back incremental runs, say) would
+        otherwise overwrite a file an index still points to.
+        """
+        for attempt in itertools.count():
+            self.timestamp = timestamp if attempt == 0 else f'{timestamp}_{attempt}'
+            self.json_file = os.path.join(output_dir, f'{prefix}_{self.timestamp}.jsonl')
+            self.csv_file = os.path.join(output_dir, f'{prefix}_summary_{self.timestamp}.csv')
+            try:
+                self._json_handle = open(self.json_file, 'x', encoding='utf-8')
+            except FileExistsError:
+                continue
+            try:
+                self._csv_handle = open(self.csv_file, 'x', newline='', encoding='utf-8')
+            except FileExistsError:
+                self._json_handle.close()
+                os.remove(self.json_file)
+                continue
+            return
+    
+    def write(self, result: Dict[str, Any]):
+        """Add one result to the output files and flush them"""
+        line = json.dumps(result, ensure_ascii=False, default=json_default)
+        with self._lock:
+            self._json_handle.write(line + '\n')
+            self._json_handle.flush()
+            if 'error' not in result:
+                self._csv_writer.writerow(summary_row(result))
+                self._csv_handle.flush()
+            if self.columnar:
+                self.columnar.write(result)
+            self.count += 1
+    
+    def close(self) -> Dict[str, Any]:
+        """Close the output files and describe what was written"""
+        with self._lock:
+            if not self._json_handle.closed:
+                self._json_handle.close()
+                self._csv_handle.close()
+            columnar_info = self.columnar.close() if self.columnar else None
+        output_info = {
+            'json_file': self.json_file,
+            'csv_file': self.csv_file,
+            'count': self.count
+        }
+        if columnar_info:
+            output_info['columnar'] = columnar_info
+        return output_info
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 class ScrapingAgent:
     """Web scraping automation agent"""
@@ -24,48 +294,591 @@ class ScrapingAgent:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Connection pools follow the fetch concurrency to avoid churn
+        self._pool_size = 0
+        self._pool_lock = threading.Lock()
+        self._size_connection_pool(int(self.config.get('concurrency', 1)))
+        self.scheduler = HostScheduler(
+            min_interval=float(self.config.get('host_min_interval', 0.0)),
+            max_retries=int(self.config.get('max_retries', 2)),
+            backoff_base=float(self.config.get('backoff_base', 0.5)),
+            backoff_max=float(self.config.get('backoff_max', 30.0)),
+            retry_after_max=float(self.config.get('retry_after_max', 120.0))
+        )
+        # robots.txt rules, checked before every fetch
+        self.robots = None
+        if self.config.get('respect_robots', True):
+            self.robots = RobotsCache(
+                self.session, self.scheduler,
+                user_agent=self.config.get('robots_user_agent', self.session.headers['User-Agent']),
+                ttl=float(self.config.get('robots_ttl', 86400))
+            )
+        self.timings = TimingCollector()
+        self.charsets = CharsetResolver(scan_bytes=int(self.config.get('charset_scan_bytes', 4096)))
+        # Slotted link/image records instead of dicts, for link-heavy crawls
+        self.compact_records = bool(self.config.get('compact_records', False))
         self.results = []
+        self._selector_plans: Dict[str, SelectorPlan] = {}
+        self.parser = self._resolve_parser(self.config.get('parser', PARSER_BACKENDS[0]))
+        
+        # Persistent response cache with conditional revalidation
+        self.cache = None
+        if self.config.get('cache_dir'):
+            self.cache = ResponseCache(
+                os.path.join(self.config['cache_dir'], 'http_cache.sqlite'),
+                int(self.config.get('cache_max_mb', 512)) * 1024 * 1024
+            )
         
+        # Raw responses archived for offline re-extraction, or replayed from an archive
+        self.archive = None
+        self.replay = bool(self.config.get('replay_archive'))
+        if self.replay:
+            self.archive = ResponseArchive(self.config['replay_archive'])
+        elif self.config.get('archive_dir'):
+            self.archive = ResponseArchive(
+                self.config['archive_dir'],
+                int(self.config.get('archive_max_mb', 1024)) * 1024 * 1024
+            )
+        
+        # Extractions reused for byte-identical bodies, in memory and optionally on disk
+        self.dedupe = self.config.get('dedupe', True)
+        # Serialized extractions by key, bounded by their total size
+        self._extractions: OrderedDict = OrderedDict()
+        self._extractions_bytes = 0
+        self.dedupe_max_bytes = int(float(self.config.get('dedupe_cache_mb', 64)) * 1024 * 1024)
+        self._extractions_lock = threading.Lock()
+        self.dedupe_stats = {'reused': 0, 'extracted': 0}
+        self.extraction_store = None
+        if self.dedupe and self.config.get('cache_dir'):
+            self.extraction_store = ExtractionStore(
+                os.path.join(self.config['cache_dir'], 'extractions.sqlite'),
+                int(self.config.get('extraction_store_max_entries', 100000))
+            )
+        
+    def _size_connection_pool(self, workers: int):
+        """Grow the session's per-host connection pools to serve workers threads at once
+        
+        Every fan-out calls this with the concurrency actually in effect, which
+        callers can set above the configured 'concurrency'; without it the
+        extra threads open and discard a connection per request.
+        """
+        size = max(10, int(workers))
+        with self._pool_lock:
+            if size <= self._pool_size:
+                return
+            # Requests in flight return their connections to the adapter they came from
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self._pool_size = size
+    
+    def _resolve_parser(self, requested: str) -> str:
+        """Pick the requested tree builder, falling back to the next installed one"""
+        candidates = [requested] + [name for name in PARSER_BACKENDS if name != requested]
+        for name in candidates:
+            if builder_registry.lookup(name) is not None:
+                if name != requested:
+                    print(f"Parser '{requested}' is not available, using '{name}'")
+                return name
+        return 'html.parser'
+    
     def scrape_url(self, url: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
         """Scrape a single URL"""
         options = options or {}
         
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
+            fetched = self._fetch(url, options)
+            return self._extract_fetched(fetched, options)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract various data types
-            result = {
+        except Exception as e:
+            return self._error_result(url, e)
+    
+    def _extract_fetched(self, fetched: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the result for fetched content, reusing an identical body's extraction"""
+        key = self._extraction_key(fetched, options)
+        result = self._reuse_extraction(fetched, options, key)
+        if not result:
+            result = self._build_result(fetched, options)
+            self._remember_extraction(result, key)
+        self._record_timing(result)
+        return result
+    
+    def _record_timing(self, result: Dict[str, Any]):
+        """Add a timed result to the batch timing report"""
+        if 'timing' in result:
+            self.timings.record(result['timing'], result.get('bytes'))
+    
+    def _extraction_key(self, fetched: Dict[str, Any], options: Dict[str, Any]) -> Optional[str]:
+        """Key an extraction by body hash plus everything that shapes its output
+        
+        None when the fetch cannot share extractions: dedupe is off, or an
+        early-stopped incremental fetch only hashed a prefix of the page.
+        """
+        if not self.dedupe or fetched.get('extracted') is not None:
+            return None
+        signature = json.dumps({
+            'parser': self.parser,
+            # The same bytes served under another declared charset decode to other text
+            'charset': header_charset(self._content_type(fetched)),
+            'fields': options.get('fields'),
+            'selectors': options.get('selectors'),
+            'max_text_length': options.get('max_text_length', 10000),
+            'table_format': options.get('table_format', 'records')
+        }, sort_keys=True)
+        return f"{fetched['content_hash']}:{hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]}"
+    
+    def _reuse_extraction(self, fetched: Dict[str, Any], options: Dict[str, Any],
+                          key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a rebased copy of an earlier extraction of the same body, if any"""
+        if key is None:
+            return None
+        
+        with self._extractions_lock:
+            payload = self._extractions.get(key)
+            if payload is not None:
+                self._extractions.move_to_end(key)
+        if payload is not None:
+            template = json.loads(payload)
+        elif self.extraction_store:
+            template = self.extraction_store.get(key)
+        else:
+            template = None
+        if template is None:
+            return None
+        
+        with self._extractions_lock:
+            self.dedupe_stats['reused'] += 1
+        result = self._rebase_result(template, fetched)
+        if options.get('timing'):
+            result['timing'] = {'fetch': fetched['timing'], 'reused': True,
+                                'total': fetched['timing']['total']}
+            result['bytes'] = fetched['bytes']
+        return result
+    
+    def _remember_extraction(self, result: Dict[str, Any], key: Optional[str]):
+        """Keep a fresh extraction so identical bodies later in the run can reuse it
+        
+        Extractions are held serialized, bounded by 'dedupe_cache_mb'; the
+        caller keeps (and may mutate) result itself.
+        """
+        if key is None or 'error' in result or 'duplicate_of' in result:
+            return
+        
+        payload = json.dumps(result, ensure_ascii=False, default=json_default)
+        # Real footprint: non-ASCII text takes two or four bytes per character
+        size = sys.getsizeof(payload)
+        with self._extractions_lock:
+            self.dedupe_stats['extracted'] += 1
+            if size <= self.dedupe_max_bytes:
+                previous = self._extractions.pop(key, None)
+                if previous is not None:
+                    self._extractions_bytes -= sys.getsizeof(previous)
+                self._extractions[key] = payload
+                self._extractions_bytes += size
+                while self._extractions_bytes > self.dedupe_max_bytes:
+                    _, evicted = self._extractions.popitem(last=False)
+                    self._extractions_bytes -= sys.getsizeof(evicted)
+        if self.extraction_store:
+            self.extraction_store.put(key, payload)
+    
+    def _rebase_result(self, template: Dict[str, Any], fetched: Dict[str, Any]) -> Dict[str, Any]:
+        """Rewrite the per-URL fields of a freshly loaded extraction for a new fetch"""
+        url = fetched['url']
+        result = template
+        result['duplicate_of'] = template['url']
+        result['url'] = url
+        result['timestamp'] = datetime.now().isoformat()
+        result['status_code'] = fetched['status_code']
+        for key in ('cache', 'truncated', 'timing', 'bytes'):
+            result.pop(key, None)
+        if fetched.get('cache'):
+            result['cache'] = fetched['cache']
+        if fetched.get('truncated'):
+            result['truncated'] = True
+        
+        # Relative links and images resolve differently against the new base URL
+        base = BaseURL(url)
+        for link in result.get('links', []):
+            link['absolute_url'] = base.absolute(link['href'])
+            link['is_external'] = base.is_external(link['absolute_url'])
+        for image in result.get('images', []):
+            image['absolute_url'] = base.absolute(image['src'])
+        return result
+    
+    def _build_result(self, fetched: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse fetched content into the per-URL result format"""
+        url = fetched['url']
+        fields = options.get('fields')
+        if fields is not None:
+            unknown = set(fields) - set(STANDARD_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown fields requested: {', '.join(sorted(unknown))}")
+        
+        # Extract various data types
+        result = {
+            'url': url,
+            'timestamp': datetime.now().isoformat(),
+            'status_code': fetched['status_code']
+        }
+        if fetched.get('cache'):
+            result['cache'] = fetched['cache']
+        if fetched.get('truncated'):
+            result['truncated'] = True
+        result['content_hash'] = fetched['content_hash']
+        if options.get('timing'):
+            result['bytes'] = fetched['bytes']
+        
+        # The incremental parser already extracted everything while downloading
+        if fetched.get('extracted') is not None:
+            result.update(fetched['extracted'])
+            if options.get('timing'):
+                result['timing'] = {'fetch': fetched['timing'], 'total': fetched['timing']['total']}
+            return result
+        
+        extract_timings = {} if options.get('timing') else None
+        timed = stage_timer(extract_timings)
+        started = time.perf_counter()
+        html = self._decode(fetched)
+        decoded = time.perf_counter()
+        soup = BeautifulSoup(html, self.parser)
+        parsed = time.perf_counter()
+        result.update(self._extract_single_pass(
+            soup, url, options.get('max_text_length', 10000), fields,
+            options.get('table_format', 'records'), extract_timings
+        ))
+        
+        # Add custom extractors if specified
+        if 'selectors' in options:
+            result['custom'] = timed('custom', self._extract_custom, soup, options['selectors'])
+        
+        if extract_timings is not None:
+            finished = time.perf_counter()
+            extract_timings['total'] = finished - parsed
+            result['timing'] = {
+                'fetch': fetched['timing'],
+                'decode': round(decoded - started, 6),
+                'parse': round(parsed - decoded, 6),
+                'extract': {name: round(value, 6) for name, value in extract_timings.items()},
+                'total': round(fetched['timing']['total'] + finished - started, 6)
+            }
+        
+        return result
+    
+    def _decode(self, fetched: Dict[str, Any]) -> str:
+        """Decode a fetched body once, so BeautifulSoup never sniffs the encoding itself"""
+        text, _ = self.charsets.decode(fetched['content'], self._content_type(fetched),
+                                       urlparse(fetched['url']).netloc)
+        return text
+    
+    def _content_type(self, fetched: Dict[str, Any]) -> str:
+        """The Content-Type header of a fetch, matched case-insensitively"""
+        return next((value for name, value in fetched['headers'].items()
+                     if name.lower() == 'content-type' and value), '')
+    
+    def _error_result(self, url: str, error: Exception) -> Dict[str, Any]:
+        """Build the result recorded for a URL that could not be scraped"""
+        return {
+            'url': url,
+            'timestamp': datetime.now().isoformat(),
+            'error': str(error),
+            'status': 'failed'
+        }
+    
+    def _fetch(self, url: str, options: Dict[str, Any] = None,
+               validators: Dict[str, str] = None) -> Dict[str, Any]:
+        """Fetch a URL as a bounded stream, revalidating against the response cache when enabled
+        
+        validators are conditional headers from a previous run; they take
+        precedence over the cache, and a 304 for them comes back as
+        not_modified without a body.
+        """
+        options = options or {}
+        started = time.perf_counter()
+        if self.replay:
+            return self._replay_fetch(url, started)
+        
+        if self.robots:
+            if not self.robots.allowed(url):
+                raise PermissionError(f"Disallowed by robots.txt: {url}")
+            delay = self.robots.crawl_delay(url)
+            if delay:
+                self.scheduler.set_host_interval(urlparse(url).netloc, delay)
+        
+        cached = self.cache.get(url) if self.cache and not validators else None
+        request_headers = validators or (self.cache.validators(cached) if cached else {})
+        
+        response = self.scheduler.request(self.session, url, timeout=30,
+                                          headers=request_headers, stream=True)
+        
+        if validators and response.status_code == 304:
+            response.close()
+            return {
                 'url': url,
-                'timestamp': datetime.now().isoformat(),
-                'status_code': response.status_code,
-                'title': self._extract_title(soup),
-                'meta': self._extract_meta(soup),
-                'headers': self._extract_headers(soup),
-                'text': self._extract_text(soup, options.get('max_text_length', 10000)),
-                'links': self._extract_links(soup, url),
-                'images': self._extract_images(soup, url),
-                'tables': self._extract_tables(soup),
-                'forms': self._extract_forms(soup),
-                'scripts': self._extract_scripts(soup),
-                'structured_data': self._extract_structured_data(soup)
+                'status_code': 304,
+                'headers': dict(response.headers),
+                'not_modified': True
             }
+        
+        if cached and response.status_code == 304:
+            response.close()
+            self.cache.record(hit=True)
+            self.cache.touch(url)
+            total = time.perf_counter() - started
+            return self._archive_response({
+                'url': url,
+                'status_code': cached['status_code'],
+                'content': cached['body'],
+                'content_hash': hashlib.sha256(cached['body']).hexdigest(),
+                'headers': {
+                    'Content-Type': cached['content_type'],
+                    'ETag': cached['etag'],
+                    'Last-Modified': cached['last_modified']
+                },
+                'cache': 'hit',
+                'timing': self._fetch_timing(response, total, 0.0),
+                'bytes': {'wire': 0, 'headers': self._header_bytes(response), 'body': len(cached['body'])}
+            })
+        
+        try:
+            response.raise_for_status()
+            self._check_content_type(response)
+            download_started = time.perf_counter()
+            content, truncated, extracted = self._read_body(response, options)
+            download = time.perf_counter() - download_started
+            wire_bytes = response.raw.tell()
+        finally:
+            response.close()
+        
+        # Partial bodies must never be served from the cache later
+        if self.cache:
+            self.cache.record(hit=False)
+            if not truncated and extracted is None:
+                self.cache.put(
+                    url, content, response.status_code,
+                    content_type=response.headers.get('Content-Type', ''),
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+        
+        return self._archive_response({
+            'url': url,
+            'status_code': response.status_code,
+            'content': content,
+            'content_hash': hashlib.sha256(content).hexdigest(),
+            'headers': dict(response.headers),
+            'cache': 'miss' if self.cache else None,
+            'truncated': truncated,
+            'extracted': extracted,
+            'timing': self._fetch_timing(response, time.perf_counter() - started, download),
+            'bytes': {'wire': wire_bytes, 'headers': self._header_bytes(response), 'body': len(content)}
+        })
+    
+    def _fetch_timing(self, response: requests.Response, total: float, download: float) -> Dict[str, float]:
+        """Fetch stage timings in seconds
+        
+        requests does not expose DNS and connect times separately, so ttfb
+        (request sent to headers parsed) includes them for new connections;
+        total also covers robots checks, politeness waits and retries.
+        """
+        return {
+            'ttfb': round(response.elapsed.total_seconds(), 6),
+            'download': round(download, 6),
+            'total': round(total, 6)
+        }
+    
+    def _header_bytes(self, response: requests.Response) -> int:
+        """Approximate size of the response header block"""
+        return sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+    
+    def _archive_response(self, fetched: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a fetched response in the archive, when archiving is enabled"""
+        if self.archive and not self.replay:
+            self.archive.write(
+                fetched['url'], fetched['status_code'], fetched['headers'], fetched['content'],
+                # An early-stopped incremental read only holds a prefix of the body
+                truncated=bool(fetched.get('truncated')) or fetched.get('extracted') is not None,
+                content_hash=fetched['content_hash']
+            )
+        return fetched
+    
+    def _replay_fetch(self, url: str, started: float) -> Dict[str, Any]:
+        """Serve a fetch from the response archive, never from the network"""
+        archived = self.archive.read(url)
+        total = round(time.perf_counter() - started, 6)
+        return {
+            'url': url,
+            'status_code': archived['status_code'],
+            'content': archived['content'],
+            'content_hash': hashlib.sha256(archived['content']).hexdigest(),
+            'headers': archived['headers'],
+            'truncated': archived['truncated'],
+            'extracted': None,
+            'timing': {'archive_read': total, 'total': total},
+            'bytes': {'body': len(archived['content'])}
+        }
+    
+    def _check_content_type(self, response: requests.Response):
+        """Refuse responses whose declared type is not worth downloading"""
+        allowed = self.config.get('allowed_content_types', ALLOWED_CONTENT_TYPES)
+        mime = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if mime and allowed and mime not in allowed:
+            raise ValueError(f"Unsupported content type: {mime}")
+    
+    def _read_body(self, response: requests.Response, options: Dict[str, Any]):
+        """Read at most max_body_bytes, optionally parsing title/text as the bytes arrive
+        
+        Returns (content, truncated, extracted); extracted is None unless the
+        incremental parser handled the page.
+        """
+        max_bytes = int(self.config.get('max_body_bytes', DEFAULT_MAX_BODY_BYTES))
+        text_budget = options.get('max_text_length', 10000)
+        fields = options.get('fields')
+        
+        parser = None
+        decoder = None
+        if (options.get('incremental') and fields is not None
+                and set(fields) <= INCREMENTAL_FIELDS and 'selectors' not in options):
+            parser = IncrementalTextParser(text_budget)
+        
+        body = bytearray()
+        truncated = False
+        for chunk in response.iter_content(chunk_size=65536):
+            remaining = max_bytes - len(body)
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+                truncated = True
+            body.extend(chunk)
             
-            # Add custom extractors if specified
-            if 'selectors' in options:
-                result['custom'] = self._extract_custom(soup, options['selectors'])
+            if parser:
+                if decoder is None:
+                    encoding = self._declared_encoding(response.headers.get('Content-Type', ''), bytes(body),
+                                                       urlparse(response.url).netloc)
+                    try:
+                        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                    except LookupError:
+                        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                parser.feed(decoder.decode(chunk))
+                if parser.satisfied(self._normalize_text):
+                    break
+            if truncated:
+                break
+        
+        extracted = None
+        if parser:
+            parser.close()
+            extracted = {}
+            if 'title' in fields:
+                extracted['title'] = parser.title or ''
+            if 'text' in fields:
+                extracted['text'] = self._normalize_text(''.join(parser.text_parts), text_budget)
+        
+        return bytes(body), truncated, extracted
+    
+    def _declared_encoding(self, content_type: str, prefix: bytes, host: str = '') -> str:
+        """Charset for the incremental decoder: declared, else the host's history, else detected"""
+        return self.charsets.resolve_prefix(content_type, prefix, host)
+    
+    def _extract_single_pass(self, soup: BeautifulSoup, base_url: str,
+                             max_text_length: int = 10000,
+                             fields: List[str] = None,
+                             table_format: str = 'records',
+                             timings: Dict[str, float] = None) -> Dict[str, Any]:
+        """Extract the requested standard fields in one walk over the tree
+        
+        With a timings dict, the time spent per field is added to it.
+        """
+        timed = stage_timer(timings)
+        wanted = set(STANDARD_FIELDS if fields is None else fields)
+        want_text = 'text' in wanted
+        want_scripts = 'scripts' in wanted
+        want_structured = 'structured_data' in wanted
+        want_headers = 'headers' in wanted
+        want_meta = 'meta' in wanted
+        want_links = 'links' in wanted
+        want_images = 'images' in wanted
+        want_tables = 'tables' in wanted
+        want_forms = 'forms' in wanted
+        
+        title = None
+        meta_tags = {}
+        headers_by_level = {level: [] for level in range(1, 7)}
+        text_parts = []
+        links, images, tables, forms, scripts, structured = [], [], [], [], [], []
+        base = BaseURL(base_url)
+        
+        # Iterative pre-order walk, so elements come out in document order
+        stack = list(reversed(soup.contents))
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, Tag):
+                if want_text and type(node) in TEXT_STRING_TYPES:
+                    text_parts.append(node)
+                continue
             
-            return result
+            name = node.name
+            if name in ('script', 'style'):
+                if name == 'script':
+                    if want_scripts:
+                        scripts.append(timed('scripts', self._script_info, node))
+                    if want_structured and node.get('type') == 'application/ld+json':
+                        entry = timed('structured_data', self._json_ld_entry, node)
+                        if entry:
+                            structured.append(entry)
+                # Script and style contents are never page text
+                continue
             
-        except Exception as e:
-            return {
-                'url': url,
-                'timestamp': datetime.now().isoformat(),
-                'error': str(e),
-                'status': 'failed'
-            }
+            if name == 'title':
+                if title is None:
+                    title = timed('title', node.get_text).strip()
+            elif name == 'meta':
+                if want_meta:
+                    timed('meta', self._add_meta, meta_tags, node)
+            elif name in HEADER_LEVELS:
+                if want_headers:
+                    level = HEADER_LEVELS[name]
+                    headers_by_level[level].append({
+                        'level': level,
+                        'text': timed('headers', node.get_text).strip()
+                    })
+            elif name == 'a':
+                if want_links and node.get('href') is not None:
+                    links.append(timed('links', self._link_info, node, base))
+            elif name == 'img':
+                if want_images and node.get('src', ''):
+                    images.append(timed('images', self._image_info, node, base))
+            elif name == 'table':
+                if want_tables:
+                    table_data = timed('tables', self._table_info, node, table_format)
+                    if table_data:
+                        tables.append(table_data)
+            elif name == 'form':
+                if want_forms:
+                    forms.append(timed('forms', self._form_to_dict, node))
+            
+            stack.extend(reversed(node.contents))
+        
+        extracted = {}
+        if 'title' in wanted:
+            extracted['title'] = title or ''
+        if want_meta:
+            extracted['meta'] = meta_tags
+        if want_headers:
+            extracted['headers'] = [header for level in range(1, 7) for header in headers_by_level[level]]
+        if want_text:
+            extracted['text'] = timed('text', self._normalize_text, ''.join(text_parts), max_text_length)
+        if want_links:
+            extracted['links'] = links
+        if want_images:
+            extracted['images'] = images
+        if want_tables:
+            extracted['tables'] = tables
+        if want_forms:
+            extracted['forms'] = forms
+        if want_scripts:
+            extracted['scripts'] = scripts
+        if want_structured:
+            extracted['structured_data'] = structured
+        return extracted
     
     def _extract_title(self, soup: BeautifulSoup) -> str:
         """Extract page title"""
@@ -76,12 +889,16 @@ class ScrapingAgent:
         """Extract meta tags"""
         meta_tags = {}
         for tag in soup.find_all('meta'):
-            if tag.get('name'):
-                meta_tags[tag.get('name')] = tag.get('content', '')
-            elif tag.get('property'):
-                meta_tags[tag.get('property')] = tag.get('content', '')
+            self._add_meta(meta_tags, tag)
         return meta_tags
     
+    def _add_meta(self, meta_tags: Dict[str, str], tag: Tag):
+        """Record a single meta tag by name or property"""
+        if tag.get('name'):
+            meta_tags[tag.get('name')] = tag.get('content', '')
+        elif tag.get('property'):
+            meta_tags[tag.get('property')] = tag.get('content', '')
+    
     def _extract_headers(self, soup: BeautifulSoup) -> List[Dict[str, str]]:
         """Extract headers (h1-h6)"""
         headers = []
@@ -95,11 +912,16 @@ class ScrapingAgent:
     
     def _extract_text(self, soup: BeautifulSoup, max_length: int = 10000) -> str:
         """Extract main text content"""
-        # Remove script and style elements
-        for script in soup(['script', 'style']):
-            script.decompose()
-        
-        text = soup.get_text()
+        # Skip script and style contents instead of decomposing them, so the
+        # soup stays intact for the other extractors
+        text = ''.join(
+            string for string in soup.find_all(string=True)
+            if type(string) in TEXT_STRING_TYPES and string.parent.name not in ('script', 'style')
+        )
+        return self._normalize_text(text, max_length)
+    
+    def _normalize_text(self, text: str, max_length: int = 10000) -> str:
+        """Collapse whitespace in raw page text and truncate it"""
         lines = (line.strip() for line in text.splitlines())
         chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
         text = ' '.join(chunk for chunk in chunks if chunk)
@@ -109,148 +931,634 @@ class ScrapingAgent:
     def _extract_links(self, soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
         """Extract all links"""
         links = []
+        base = BaseURL(base_url)
         for link in soup.find_all('a', href=True):
-            href = link['href']
-            absolute_url = urljoin(base_url, href)
-            links.append({
-                'text': link.get_text().strip(),
-                'href': href,
-                'absolute_url': absolute_url,
-                'is_external': urlparse(absolute_url).netloc != urlparse(base_url).netloc
-            })
+            links.append(self._link_info(link, base))
         return links
     
+    def _link_info(self, link: Tag, base: BaseURL) -> Dict[str, Any]:
+        """Describe a single anchor with an href"""
+        href = link['href']
+        text = link.get_text().strip()
+        if self.compact_records:
+            origin, path, is_external = base.resolve(href)
+            return LinkRecord(text, href, origin, path, is_external)
+        
+        absolute_url = base.absolute(href)
+        return {
+            'text': text,
+            'href': href,
+            'absolute_url': absolute_url,
+            'is_external': base.is_external(absolute_url)
+        }
+    
     def _extract_images(self, soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
         """Extract all images"""
         images = []
+        base = BaseURL(base_url)
         for img in soup.find_all('img'):
-            src = img.get('src', '')
-            if src:
-                images.append({
-                    'src': src,
-                    'absolute_url': urljoin(base_url, src),
-                    'alt': img.get('alt', ''),
-                    'title': img.get('title', '')
-                })
+            if img.get('src', ''):
+                images.append(self._image_info(img, base))
         return images
     
+    def _image_info(self, img: Tag, base: BaseURL) -> Dict[str, str]:
+        """Describe a single image with a src"""
+        src = img.get('src', '')
+        if self.compact_records:
+            origin, path, _ = base.resolve(src)
+            return ImageRecord(src, origin, path, img.get('alt', ''), img.get('title', ''))
+        
+        return {
+            'src': src,
+            'absolute_url': base.absolute(src),
+            'alt': img.get('alt', ''),
+            'title': img.get('title', '')
+        }
+    
     def _extract_tables(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
         """Extract tables as structured data"""
         tables = []
         for table in soup.find_all('table'):
-            table_data = []
-            headers = []
-            
-            # Extract headers
-            thead = table.find('thead')
-            if thead:
-                headers = [th.get_text().strip() for th in thead.find_all('th')]
-            elif table.find('tr'):
-                first_row = table.find('tr')
-                if first_row.find('th'):
-                    headers = [th.get_text().strip() for th in first_row.find_all('th')]
-            
-            # Extract rows
-            tbody = table.find('tbody') or table
-            for row in tbody.find_all('tr'):
-                cells = row.find_all(['td', 'th'])
-                if cells:
-                    row_data = [cell.get_text().strip() for cell in cells]
-                    if headers and len(row_data) == len(headers):
-                        table_data.append(dict(zip(headers, row_data)))
-                    else:
-                        table_data.append(row_data)
-            
-            if table_data:
-                tables.append({
-                    'headers': headers,
-                    'data': table_data
-                })
+            table_info = self._table_to_dict(table)
+            if table_info:
+                tables.append(table_info)
         
         return tables
     
+    def _table_info(self, table: Tag, table_format: str = 'records') -> Optional[Dict[str, Any]]:
+        """Describe a table as plain records or, with 'typed', from its typed DataFrame"""
+        if table_format == 'records':
+            return self._table_to_dict(table)
+        if table_format != 'typed':
+            raise ValueError(f"Unknown table format: {table_format}")
+        frame = table_to_frame(table)
+        return frame_to_view(frame) if frame is not None else None
+    
+    def extract_table_frames(self, url: str, options: Dict[str, Any] = None) -> List[Any]:
+        """Fetch a page and return its tables as typed pandas DataFrames"""
+        fetched = self._fetch(url, options)
+        soup = BeautifulSoup(self._decode(fetched), self.parser)
+        frames = []
+        for table in soup.find_all('table'):
+            frame = table_to_frame(table)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+    
+    def _table_to_dict(self, table: Tag) -> Optional[Dict[str, Any]]:
+        """Convert a single table element, or None if it has no rows"""
+        table_data = []
+        headers = []
+            
+        # Extract headers
+        thead = table.find('thead')
+        if thead:
+            headers = [th.get_text().strip() for th in thead.find_all('th')]
+        elif table.find('tr'):
+            first_row = table.find('tr')
+            if first_row.find('th'):
+                headers = [th.get_text().strip() for th in first_row.find_all('th')]
+        
+        # Extract rows
+        tbody = table.find('tbody') or table
+        for row in tbody.find_all('tr'):
+            cells = row.find_all(['td', 'th'])
+            if cells:
+                row_data = [cell.get_text().strip() for cell in cells]
+                if headers and len(row_data) == len(headers):
+                    table_data.append(dict(zip(headers, row_data)))
+                else:
+                    table_data.append(row_data)
+        
+        if not table_data:
+            return None
+        return {
+            'headers': headers,
+            'data': table_data
+        }
+    
     def _extract_forms(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
         """Extract form information"""
         forms = []
         for form in soup.find_all('form'):
-            form_data = {
-                'action': form.get('action', ''),
-                'method': form.get('method', 'get').upper(),
-                'fields': []
+            forms.append(self._form_to_dict(form))
+        
+        return forms
+    
+    def _form_to_dict(self, form: Tag) -> Dict[str, Any]:
+        """Describe a single form and its fields"""
+        form_data = {
+            'action': form.get('action', ''),
+            'method': form.get('method', 'get').upper(),
+            'fields': []
+        }
+        
+        for input_tag in form.find_all(['input', 'select', 'textarea']):
+            field = {
+                'type': input_tag.name,
+                'name': input_tag.get('name', ''),
+                'id': input_tag.get('id', ''),
+                'required': input_tag.has_attr('required')
             }
             
-            for input_tag in form.find_all(['input', 'select', 'textarea']):
-                field = {
-                    'type': input_tag.name,
-                    'name': input_tag.get('name', ''),
-                    'id': input_tag.get('id', ''),
-                    'required': input_tag.has_attr('required')
-                }
-                
-                if input_tag.name == 'input':
-                    field['input_type'] = input_tag.get('type', 'text')
-                elif input_tag.name == 'select':
-                    field['options'] = [option.get_text().strip() 
-                                      for option in input_tag.find_all('option')]
-                
-                form_data['fields'].append(field)
+            if input_tag.name == 'input':
+                field['input_type'] = input_tag.get('type', 'text')
+            elif input_tag.name == 'select':
+                field['options'] = [option.get_text().strip() 
+                                  for option in input_tag.find_all('option')]
             
-            forms.append(form_data)
+            form_data['fields'].append(field)
         
-        return forms
+        return form_data
     
     def _extract_scripts(self, soup: BeautifulSoup) -> List[Dict[str, str]]:
         """Extract script references"""
         scripts = []
         for script in soup.find_all('script'):
-            script_info = {}
-            if script.get('src'):
-                script_info['src'] = script.get('src')
-                script_info['type'] = 'external'
-            else:
-                script_info['type'] = 'inline'
-                script_info['length'] = len(script.get_text())
-            scripts.append(script_info)
+            scripts.append(self._script_info(script))
         return scripts
     
+    def _script_info(self, script: Tag) -> Dict[str, Any]:
+        """Describe a single script element"""
+        script_info = {}
+        if script.get('src'):
+            script_info['src'] = script.get('src')
+            script_info['type'] = 'external'
+        else:
+            script_info['type'] = 'inline'
+            # Count raw child strings; builders disagree on the string class used
+            script_info['length'] = sum(len(child) for child in script.contents
+                                        if isinstance(child, NavigableString))
+        return script_info
+    
     def _extract_structured_data(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
         """Extract structured data (JSON-LD, microdata)"""
         structured = []
         
         # JSON-LD
         for script in soup.find_all('script', type='application/ld+json'):
-            try:
-                data = json.loads(script.string)
-                structured.append({
-                    'type': 'json-ld',
-                    'data': data
-                })
-            except:
-                pass
+            entry = self._json_ld_entry(script)
+            if entry:
+                structured.append(entry)
         
         return structured
     
-    def _extract_custom(self, soup: BeautifulSoup, selectors: Dict[str, str]) -> Dict[str, Any]:
+    def _json_ld_entry(self, script: Tag) -> Optional[Dict[str, Any]]:
+        """Parse a JSON-LD script, or None if it is not valid JSON"""
+        try:
+            return {
+                'type': 'json-ld',
+                'data': json.loads(script.string)
+            }
+        except:
+            return None
+    
+    def _extract_custom(self, soup: BeautifulSoup, selectors: Dict[str, Any]) -> Dict[str, Any]:
         """Extract custom data using CSS selectors"""
-        custom_data = {}
-        for key, selector in selectors.items():
-            elements = soup.select(selector)
-            if elements:
-                if len(elements) == 1:
-                    custom_data[key] = elements[0].get_text().strip()
-                else:
-                    custom_data[key] = [el.get_text().strip() for el in elements]
-        return custom_data
+        return self._selector_plan(selectors).evaluate(soup)
     
-    def scrape_multiple(self, urls: List[str], options: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Scrape multiple URLs"""
+    def _selector_plan(self, selectors: Dict[str, Any]) -> SelectorPlan:
+        """Return the compiled plan for a selector set, building it on first use"""
+        plan_key = json.dumps(selectors, sort_keys=True)
+        plan = self._selector_plans.get(plan_key)
+        if plan is None:
+            plan = SelectorPlan(selectors)
+            self._selector_plans[plan_key] = plan
+        return plan
+    
+    def discover_urls(self, sources: List[str], limit: int = 50000) -> List[str]:
+        """Collect page URLs from sitemaps
+        
+        Each source is either a sitemap (.xml / .xml.gz) or a site URL whose
+        robots.txt Sitemap lines are followed, falling back to /sitemap.xml.
+        URLs disallowed by robots.txt are left out.
+        """
+        robots = self.robots or RobotsCache(self.session, self.scheduler)
+        urls = []
+        seen_urls = set()
+        seen_sitemaps = set()
+        
+        for source in sources:
+            path = urlparse(source).path
+            if path.endswith(('.xml', '.xml.gz')):
+                sitemaps = [source]
+            else:
+                sitemaps = robots.sitemaps(source) or [urljoin(source, '/sitemap.xml')]
+            
+            for sitemap in sitemaps:
+                try:
+                    for entry in iter_sitemap(self.session, sitemap, self.scheduler, seen=seen_sitemaps):
+                        url = entry['loc']
+                        if url in seen_urls or (self.robots and not self.robots.allowed(url)):
+                            continue
+                        seen_urls.add(url)
+                        urls.append(url)
+                        if len(urls) >= limit:
+                            return urls
+                except (requests.RequestException, ET.ParseError, OSError) as e:
+                    print(f"Skipping sitemap {sitemap}: {e}")
+        
+        print(f"Discovered {len(urls)} URLs from sitemaps")
+        return urls
+    
+    def scrape_multiple(self, urls: List[str], options: Dict[str, Any] = None,
+                        concurrency: int = None,
+                        writer: StreamingResultWriter = None) -> List[Dict[str, Any]]:
+        """Scrape multiple URLs
+        
+        With a writer, each result is written as soon as it is produced and
+        not kept in memory, so the returned list is empty.
+        """
+        concurrency = concurrency or self.config.get('concurrency', 1)
+        if self.config.get('parse_workers'):
+            return self.scrape_pipeline(urls, options, fetch_workers=concurrency, writer=writer)
+        if concurrency > 1:
+            return asyncio.run(self.scrape_multiple_async(urls, options, concurrency, writer=writer))
+        
         results = []
         for url in urls:
             print(f"Scraping: {url}")
             result = self.scrape_url(url, options)
-            results.append(result)
+            if writer:
+                writer.write(result)
+            else:
+                results.append(result)
         return results
     
+    async def scrape_multiple_async(self, urls: List[str], options: Dict[str, Any] = None,
+                                    concurrency: int = 10, per_host: int = None,
+                                    writer: StreamingResultWriter = None) -> List[Dict[str, Any]]:
+        """Scrape multiple URLs concurrently with global and per-host limits"""
+        per_host = per_host or self.config.get('per_host_concurrency', 2)
+        global_limit = asyncio.Semaphore(concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        loop = asyncio.get_running_loop()
+        self._size_connection_pool(concurrency)
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def scrape_one(url: str) -> Dict[str, Any]:
+                host = urlparse(url).netloc
+                host_limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+                # Take the host slot first so a busy host never holds a global slot
+                async with host_limit:
+                    async with global_limit:
+                        print(f"Scraping: {url}")
+                        result = await loop.run_in_executor(executor, self.scrape_url, url, options)
+                if writer:
+                    writer.write(result)
+                    return None
+                return result
+            
+            # gather keeps results in input order
+            results = await asyncio.gather(*(scrape_one(url) for url in urls))
+            return [] if writer else results
+    
+    def scrape_pipeline(self, urls: List[str], options: Dict[str, Any] = None,
+                        fetch_workers: int = None, parse_workers: int = None,
+                        queue_size: int = None,
+                        writer: StreamingResultWriter = None) -> List[Dict[str, Any]]:
+        """Scrape URLs with fetch threads feeding a process pool of parsers
+        
+        Fetch threads hand raw bodies to the parse stage through a bounded
+        queue, so network I/O and BeautifulSoup work overlap and parsing
+        scales with the number of cores.
+        """
+        options = options or {}
+        fetch_workers = fetch_workers or self.config.get('concurrency', 8)
+        self._size_connection_pool(fetch_workers)
+        parse_workers = parse_workers or self.config.get('parse_workers') or os.cpu_count() or 1
+        queue_size = queue_size or self.config.get('pipeline_queue_size', parse_workers * 2)
+        
+        fetched_queue = queue.Queue(maxsize=queue_size)
+        pending_urls = iter(enumerate(urls))
+        url_lock = threading.Lock()
+        results: List[Optional[Dict[str, Any]]] = [] if writer else [None] * len(urls)
+        
+        def fetch_stage():
+            while True:
+                with url_lock:
+                    item = next(pending_urls, None)
+                if item is None:
+                    break
+                index, url = item
+                print(f"Scraping: {url}")
+                try:
+                    fetched_queue.put((index, self._fetch(url, options), None))
+                except Exception as e:
+                    fetched_queue.put((index, None, self._error_result(url, e)))
+            fetched_queue.put(None)
+        
+        def collect(index: int, result: Dict[str, Any]):
+            self._record_timing(result)
+            if writer:
+                writer.write(result)
+            else:
+                results[index] = result
+        
+        # The pool exists before any fetcher starts; see _parse_pool
+        with self._parse_pool(parse_workers) as executor:
+            fetchers = [threading.Thread(target=fetch_stage, daemon=True) for _ in range(fetch_workers)]
+            for fetcher in fetchers:
+                fetcher.start()
+            
+            in_flight = {}
+            finished_fetchers = 0
+            
+            def drain(block: bool):
+                done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, url, key = in_flight.pop(future)
+                    collect(index, self._parsed_result(future, url, key))
+            
+            while finished_fetchers < len(fetchers):
+                item = fetched_queue.get()
+                if item is None:
+                    finished_fetchers += 1
+                    continue
+                
+                index, fetched, error = item
+                if error:
+                    collect(index, error)
+                    continue
+                
+                key = self._extraction_key(fetched, options)
+                duplicate = self._reuse_extraction(fetched, options, key)
+                if duplicate:
+                    collect(index, duplicate)
+                    continue
+                
+                # Keep the parse stage bounded too, so the queue applies backpressure
+                while len(in_flight) >= parse_workers * 2:
+                    drain(block=True)
+                in_flight[executor.submit(_parse_in_worker, fetched, options)] = (index, fetched['url'], key)
+                drain(block=False)
+            
+            while in_flight:
+                drain(block=True)
+        
+        return results
+    
+    def _parse_pool(self, workers: int) -> ProcessPoolExecutor:
+        """Process pool of parse workers, each with its own agent
+        
+        Forking while fetch threads hold locks (sessions, caches, logging) can
+        deadlock a child, so workers come from a fork server where there is one
+        and callers create the pool before starting any fetch thread.
+        """
+        # The response cache and archive stay in this process
+        worker_config = {key: value for key, value in self.config.items()
+                         if key not in ('cache_dir', 'archive_dir', 'replay_archive')}
+        return ProcessPoolExecutor(max_workers=workers, mp_context=_parse_pool_context(),
+                                   initializer=_init_parse_worker, initargs=(worker_config,))
+    
+    def _parsed_result(self, future, url: str, key: Optional[str]) -> Dict[str, Any]:
+        """Collect a parse worker's result, remembering it under key for later duplicates"""
+        try:
+            result = future.result()
+        except Exception as e:
+            return self._error_result(url, e)
+        charset = result.pop('_charset', None)
+        if charset:
+            self.charsets.merge(charset['counts'], charset['host'], charset['encoding'])
+        self._remember_extraction(result, key)
+        return result
+    
+    def crawl(self, seed_urls: List[str], options: Dict[str, Any] = None,
+              writer: StreamingResultWriter = None,
+              priority: Callable[[str, int], float] = None) -> List[Dict[str, Any]]:
+        """Crawl breadth-first from seed URLs, following links found on each page
+        
+        Limits come from the crawl config keys: 'crawl_max_depth',
+        'crawl_max_pages', 'crawl_same_domain' and 'crawl_prefixes'.
+        Within a depth, URLs with a higher priority(url, depth) go first.
+        A page is started as soon as a fetch slot frees up, within
+        'concurrency' overall and 'per_host_concurrency' per host; with
+        'parse_workers' one process pool parses for the whole crawl.
+        """
+        options = dict(options or {})
+        frontier = CrawlFrontier(
+            max_depth=self.config.get('crawl_max_depth', 2),
+            max_pages=self.config.get('crawl_max_pages', 1000),
+            same_domain=self.config.get('crawl_same_domain', True),
+            allowed_prefixes=self.config.get('crawl_prefixes'),
+            priority=priority,
+            seen_capacity=self.config.get('crawl_seen_capacity', 1000000)
+        )
+        for url in seed_urls:
+            frontier.add_seed(url)
+        
+        # Links drive the crawl even when the caller did not ask for them
+        keep_links = options.get('fields') is None or 'links' in options['fields']
+        if not keep_links:
+            options['fields'] = list(options['fields']) + ['links']
+        
+        concurrency = max(1, int(self.config.get('concurrency', 1)))
+        per_host = max(1, int(self.config.get('per_host_concurrency', 2)))
+        parse_workers = int(self.config.get('parse_workers') or 0)
+        self._size_connection_pool(concurrency)
+        results = []
+        
+        def finish(result: Dict[str, Any], depth: int):
+            result['depth'] = depth
+            if depth < frontier.max_depth:
+                for link in result.get('links', []):
+                    if frontier.same_domain and link['is_external']:
+                        continue
+                    frontier.add(link['absolute_url'], depth + 1)
+            
+            if not keep_links:
+                result.pop('links', None)
+            if writer:
+                writer.write(result)
+            else:
+                results.append(result)
+        
+        # Both pools live for the whole crawl; the parse pool is created before any fetch thread
+        with ExitStack() as stack:
+            parse_pool = stack.enter_context(self._parse_pool(parse_workers)) if parse_workers else None
+            fetch_pool = stack.enter_context(ThreadPoolExecutor(max_workers=concurrency))
+            # Pages waiting in the parse pool hold back new fetches, as in scrape_pipeline
+            parse_limit = parse_workers * 2 if parse_pool else concurrency
+            fetching: Dict[Any, Tuple[str, int]] = {}
+            parsing: Dict[Any, Tuple[str, int, Optional[str]]] = {}
+            host_load: Dict[str, int] = {}
+            # URLs taken from the frontier while their host was at its limit
+            waiting: deque = deque()
+            
+            def start(url: str, depth: int):
+                host = urlparse(url).netloc
+                host_load[host] = host_load.get(host, 0) + 1
+                print(f"Scraping: {url}")
+                task = self._fetch if parse_pool else self.scrape_url
+                fetching[fetch_pool.submit(task, url, options)] = (url, depth)
+            
+            def has_slot(url: str) -> bool:
+                return host_load.get(urlparse(url).netloc, 0) < per_host
+            
+            def fill():
+                while len(fetching) < concurrency and len(parsing) < parse_limit:
+                    item = next((entry for entry in waiting if has_slot(entry[0])), None)
+                    if item:
+                        waiting.remove(item)
+                    else:
+                        item = frontier.pop()
+                        if item is None:
+                            return
+                        if not has_slot(item[0]):
+                            # Stop here rather than draining a one-host frontier into waiting
+                            waiting.append(item)
+                            return
+                    start(*item)
+            
+            fill()
+            while fetching or parsing:
+                done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in parsing:
+                        url, depth, key = parsing.pop(future)
+                        result = self._parsed_result(future, url, key)
+                        self._record_timing(result)
+                        finish(result, depth)
+                        continue
+                    
+                    url, depth = fetching.pop(future)
+                    host_load[urlparse(url).netloc] -= 1
+                    if not parse_pool:
+                        # scrape_url reports failures as error results
+                        finish(future.result(), depth)
+                        continue
+                    try:
+                        fetched = future.result()
+                    except Exception as e:
+                        finish(self._error_result(url, e), depth)
+                        continue
+                    key = self._extraction_key(fetched, options)
+                    duplicate = self._reuse_extraction(fetched, options, key)
+                    if duplicate:
+                        self._record_timing(duplicate)
+                        finish(duplicate, depth)
+                    else:
+                        parsing[parse_pool.submit(_parse_in_worker, fetched, options)] = (url, depth, key)
+                fill()
+        
+        stats = frontier.get_stats()
+        print(f"Crawl finished: {stats['dispatched']} pages, {stats['queued']} left in frontier")
+        return results
+    
+    def scrape_to_files(self, urls: List[str], options: Dict[str, Any] = None,
+                        output_dir: str = 'outputs/scraping', crawl: bool = False) -> Dict[str, Any]:
+        """Scrape (or crawl from) URLs and stream every result straight to JSONL and CSV"""
+        writer = StreamingResultWriter(output_dir, columnar_format=self.config.get('columnar_format'))
+        try:
+            if crawl:
+                self.crawl(urls, options, writer=writer)
+            else:
+                self.scrape_multiple(urls, options, writer=writer)
+        finally:
+            output_info = writer.close()
+        
+        print(f"Results streamed to {output_dir}")
+        output_info.update(self.get_run_stats())
+        return output_info
+    
+    def scrape_incremental(self, urls: List[str], previous: str, options: Dict[str, Any] = None,
+                           output_dir: str = 'outputs/scraping') -> Dict[str, Any]:
+        """Re-scrape URLs against a previous run, writing only the pages that changed
+        
+        previous is a scraped_data .json/.jsonl file or the index of an
+        earlier incremental run. Pages answering 304 to their old validators,
+        or whose body hash is unchanged, are not parsed again; the new index
+        points at their existing records instead.
+        """
+        options = options or {}
+        previous_entries = load_index(previous)
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'failed': 0}
+        entries = {}
+        concurrency = max(1, int(self.config.get('concurrency', 1)))
+        
+        writer = StreamingResultWriter(output_dir, prefix='scraped_delta',
+                                       columnar_format=self.config.get('columnar_format'))
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                outcomes = executor.map(
+                    lambda url: self._rescrape_url(url, previous_entries.get(url), options), urls
+                )
+                for url, (status, result, headers) in zip(urls, outcomes):
+                    counts[status] += 1
+                    previous_entry = previous_entries.get(url)
+                    
+                    # Failed refreshes keep pointing at the last good record
+                    if status == 'unchanged' or (status == 'failed' and previous_entry):
+                        entry = dict(previous_entry)
+                        if status == 'failed':
+                            entry['error'] = result['error']
+                    else:
+                        entry = {
+                            'file': os.path.abspath(writer.json_file),
+                            'record': writer.count,
+                            'content_hash': result.get('content_hash')
+                        }
+                        writer.write(result)
+                    
+                    entry['status'] = status
+                    if headers.get('ETag'):
+                        entry['etag'] = headers['ETag']
+                    if headers.get('Last-Modified'):
+                        entry['last_modified'] = headers['Last-Modified']
+                    entries[url] = entry
+        finally:
+            output_info = writer.close()
+        
+        counts['removed'] = len(set(previous_entries) - set(entries))
+        index_file = os.path.join(output_dir, f'scraped_index_{writer.timestamp}.json')
+        write_index(index_file, entries, previous, counts)
+        
+        print(f"Incremental run: {counts['changed']} changed, {counts['new']} new, "
+              f"{counts['unchanged']} unchanged, {counts['failed']} failed")
+        output_info.update({'index_file': index_file, 'incremental': counts})
+        output_info.update(self.get_run_stats())
+        return output_info
+    
+    def _rescrape_url(self, url: str, previous_entry: Optional[Dict[str, Any]],
+                      options: Dict[str, Any]):
+        """Refetch one URL; return (status, result or None, response headers)"""
+        validators = {}
+        if previous_entry:
+            if previous_entry.get('etag'):
+                validators['If-None-Match'] = previous_entry['etag']
+            if previous_entry.get('last_modified'):
+                validators['If-Modified-Since'] = previous_entry['last_modified']
+        
+        try:
+            fetched = self._fetch(url, options, validators or None)
+            if fetched.get('not_modified'):
+                return 'unchanged', None, fetched['headers']
+            if previous_entry and fetched['content_hash'] == previous_entry.get('content_hash'):
+                return 'unchanged', None, fetched['headers']
+            
+            result = self._extract_fetched(fetched, options)
+            return ('changed' if previous_entry else 'new'), result, fetched['headers']
+        except Exception as e:
+            return 'failed', self._error_result(url, e), {}
+    
+    def get_run_stats(self) -> Dict[str, Any]:
+        """Collect cache and per-host fetch statistics for the run so far"""
+        stats = {'host_stats': self.scheduler.get_stats()}
+        if self.dedupe:
+            stats['dedupe_stats'] = dict(self.dedupe_stats)
+            with self._extractions_lock:
+                stats['dedupe_stats'].update(entries=len(self._extractions), memory_bytes=self._extractions_bytes)
+        if self.cache:
+            stats['cache_stats'] = self.cache.get_stats()
+        if self.robots:
+            stats['robots_stats'] = self.robots.get_stats()
+        if self.archive:
+            stats['archive_stats'] = self.archive.get_stats()
+        stats['charset_stats'] = self.charsets.get_stats()
+        if self.timings.pages:
+            stats['timing_report'] = self.timings.report()
+        return stats
+    
     def save_results(self, results: List[Dict[str, Any]], output_dir: str = 'outputs/scraping'):
         """Save scraping results"""
         os.makedirs(output_dir, exist_ok=True)
@@ -260,33 +1568,76 @@ class ScrapingAgent:
         # Save as JSON
         json_file = os.path.join(output_dir, f'scraped_data_{timestamp}.json')
         with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+            json.dump(results, f, indent=2, ensure_ascii=False, default=json_default)
         
         # Save summary as CSV
         csv_file = os.path.join(output_dir, f'summary_{timestamp}.csv')
         if results:
             with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-                fieldnames = ['url', 'title', 'status_code', 'text_length', 'links_count', 'images_count']
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
                 writer.writeheader()
                 
                 for result in results:
                     if 'error' not in result:
-                        writer.writerow({
-                            'url': result.get('url', ''),
-                            'title': result.get('title', ''),
-                            'status_code': result.get('status_code', ''),
-                            'text_length': len(result.get('text', '')),
-                            'links_count': len(result.get('links', [])),
-                            'images_count': len(result.get('images', []))
-                        })
+                        writer.writerow(summary_row(result))
         
         print(f"Results saved to {output_dir}")
-        return {
+        output_info = {
             'json_file': json_file,
             'csv_file': csv_file,
             'count': len(results)
         }
+        
+        # Flattened links, images, meta and tables for analytics
+        if self.config.get('columnar_format'):
+            exporter = ColumnarExporter(output_dir, timestamp, self.config['columnar_format'])
+            for result in results:
+                exporter.write(result)
+            output_info['columnar'] = exporter.close()
+        output_info.update(self.get_run_stats())
+        return output_info
+
+
+# Per-process agent used by the scrape_pipeline parse stage
+_parse_agent: Optional[ScrapingAgent] = None
+
+
+def _parse_pool_context():
+    """Start method for parse workers: forkserver where the platform has it, else the default"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Workers fork from a server that has already imported pandas, bs4 and this module
+        context.set_forkserver_preload(['scraping_agent'])
+        return context
+    return None
+
+
+def _init_parse_worker(config: Dict[str, Any]):
+    """Create the agent a parse worker process reuses for every page"""
+    global _parse_agent
+    _parse_agent = ScrapingAgent(config)
+
+
+def _parse_in_worker(fetched: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a scraping result from fetched content inside a worker process
+    
+    How the body's charset was resolved rides back under '_charset', for
+    the parent's charset stats and host history (see _parsed_result).
+    """
+    charsets = _parse_agent.charsets
+    before = charsets.get_stats()
+    try:
+        result = _parse_agent._build_result(fetched, options)
+    except Exception as e:
+        result = _parse_agent._error_result(fetched['url'], e)
+    
+    after = charsets.get_stats()
+    counts = {source: after[source] - before[source] for source in charsets.stats
+              if after[source] != before[source]}
+    if counts:
+        host = urlparse(fetched['url']).netloc
+        result['_charset'] = {'counts': counts, 'host': host, 'encoding': charsets.host_encoding(host)}
+    return result
 
 
 def main():
@@ -295,6 +1646,28 @@ def main():
     config = {
         'target_urls': os.environ.get('TARGET_URLS', '').split(','),
         'output_format': os.environ.get('OUTPUT_FORMAT', 'json'),
+        'parser': os.environ.get('HTML_PARSER', PARSER_BACKENDS[0]),
+        'cache_dir': os.environ.get('SCRAPING_CACHE_DIR', ''),
+        'cache_max_mb': int(os.environ.get('SCRAPING_CACHE_MAX_MB', '512')),
+        'stream_output': os.environ.get('STREAM_OUTPUT', 'false').lower() == 'true',
+        'parse_workers': int(os.environ.get('SCRAPING_PARSE_WORKERS', '0')),
+        'max_body_bytes': int(os.environ.get('SCRAPING_MAX_BODY_BYTES', str(DEFAULT_MAX_BODY_BYTES))),
+        'host_min_interval': float(os.environ.get('SCRAPING_HOST_INTERVAL', '0')),
+        'max_retries': int(os.environ.get('SCRAPING_MAX_RETRIES', '2')),
+        'retry_after_max': float(os.environ.get('SCRAPING_RETRY_AFTER_MAX', '120')),
+        'crawl': os.environ.get('CRAWL', 'false').lower() == 'true',
+        'crawl_max_depth': int(os.environ.get('CRAWL_MAX_DEPTH', '2')),
+        'crawl_max_pages': int(os.environ.get('CRAWL_MAX_PAGES', '1000')),
+        'concurrency': int(os.environ.get('SCRAPING_CONCURRENCY', '1')),
+        'per_host_concurrency': int(os.environ.get('SCRAPING_PER_HOST_CONCURRENCY', '2')),
+        'previous_results': os.environ.get('PREVIOUS_RESULTS', ''),
+        'columnar_format': os.environ.get('COLUMNAR_FORMAT', ''),
+        'compact_records': os.environ.get('SCRAPING_COMPACT_RECORDS', 'false').lower() == 'true',
+        'respect_robots': os.environ.get('RESPECT_ROBOTS', 'true').lower() == 'true',
+        'sitemap_urls': [url for url in os.environ.get('SITEMAP_URLS', '').split(',') if url],
+        'sitemap_max_urls': int(os.environ.get('SITEMAP_MAX_URLS', '50000')),
+        'archive_dir': os.environ.get('SCRAPING_ARCHIVE_DIR', ''),
+        'replay_archive': os.environ.get('REPLAY_ARCHIVE', ''),
         'options': json.loads(os.environ.get('SCRAPING_OPTIONS', '{}'))
     }
     
@@ -302,7 +1675,8 @@ def main():
     if len(sys.argv) > 1:
         config['target_urls'] = sys.argv[1:]
     
-    if not config['target_urls'] or config['target_urls'] == ['']:
+    config['target_urls'] = [url for url in config['target_urls'] if url]
+    if not config['target_urls'] and not config['sitemap_urls'] and not config['replay_archive']:
         print("Error: No target URLs specified")
         print("Usage: python scraping_agent.py <url1> <url2> ...")
         sys.exit(1)
@@ -310,22 +1684,56 @@ def main():
     # Initialize agent
     agent = ScrapingAgent(config)
     
+    # Replaying with no URL list re-extracts everything in the archive
+    if config['replay_archive'] and not config['target_urls']:
+        config['target_urls'] = list(agent.archive.urls())
+    
+    # Bulk URL lists from sitemaps
+    if config['sitemap_urls']:
+        config['target_urls'] += agent.discover_urls(config['sitemap_urls'], config['sitemap_max_urls'])
+    
     # Perform scraping
     print(f"Starting scraping for {len(config['target_urls'])} URLs...")
-    results = agent.scrape_multiple(config['target_urls'], config.get('options'))
-    
-    # Save results
-    output_info = agent.save_results(results)
+    if config['previous_results']:
+        # Only pages that changed since the previous run are written
+        output_info = agent.scrape_incremental(config['target_urls'], config['previous_results'],
+                                               config.get('options'))
+    elif config['stream_output']:
+        # Results go to disk one by one as they are scraped
+        output_info = agent.scrape_to_files(config['target_urls'], config.get('options'),
+                                            crawl=config['crawl'])
+    else:
+        if config['crawl']:
+            results = agent.crawl(config['target_urls'], config.get('options'))
+        else:
+            results = agent.scrape_multiple(config['target_urls'], config.get('options'))
+        
+        # Save results
+        output_info = agent.save_results(results)
     
     # Output summary
     print("\n=== Scraping Complete ===")
     print(f"URLs processed: {output_info['count']}")
     print(f"Results saved to: {output_info['json_file']}")
     print(f"Summary saved to: {output_info['csv_file']}")
+    if 'index_file' in output_info:
+        print(f"Index saved to: {output_info['index_file']}")
+    if 'columnar' in output_info:
+        print(f"Columnar tables saved to: {', '.join(output_info['columnar']['files'].values())}")
+    if 'cache_stats' in output_info:
+        stats = output_info['cache_stats']
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    for stage, stats in output_info.get('timing_report', {}).get('stages', {}).items():
+        print(f"Stage {stage}: p50 {stats['p50']}s, p95 {stats['p95']}s, p99 {stats['p99']}s")
+    for host, stats in output_info.get('host_stats', {}).items():
+        print(f"Host {host}: {stats['requests']} requests, {stats['retries']} retries, "
+              f"p50 {stats['latency_p50']}s, p95 {stats['latency_p95']}s")
     
     # Return results for GitHub Actions
     print(f"::set-output name=results_file::{output_info['json_file']}")
     print(f"::set-output name=summary_file::{output_info['csv_file']}")
+    if 'index_file' in output_info:
+        print(f"::set-output name=index_file::{output_info['index_file']}")
     
 
 if __name__ == '__main__':
@@ -0,0 +1,150 @@
+"""
+Scraping Archive - Append-only WARC response archive for the scraping agent
+Stores every fetched response (headers, body and fetch time) as its own
+gzip member in WARC/1.1 files, with a JSONL index of record offsets so
+pages can be re-extracted later without touching the network
+"""
+
+import gzip
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from http.client import responses as HTTP_REASONS
+from typing import Dict, Any, Iterator, Optional
+
+# Recomputed on replay; the stored body is already decoded
+HOP_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+
+class ResponseArchive:
+    """WARC files of raw responses plus an offset index, appended to by fetches"""
+    
+    def __init__(self, directory: str, max_file_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.index_file = os.path.join(directory, 'archive_index.jsonl')
+        self.stats = {'written': 0, 'read': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        os.makedirs(directory, exist_ok=True)
+        
+        existing = sorted(name for name in os.listdir(directory) if name.endswith('.warc.gz'))
+        self._sequence = len(existing)
+        self._current = existing[-1] if existing else None
+    
+    def _target_file(self, size: int) -> str:
+        """Name of the file the next record goes to, rotating full files"""
+        if self._current:
+            path = os.path.join(self.directory, self._current)
+            if os.path.getsize(path) + size <= self.max_file_bytes:
+                return self._current
+        self._sequence += 1
+        self._current = f'archive-{self._sequence:05d}.warc.gz'
+        return self._current
+    
+    def write(self, url: str, status_code: int, headers: Dict[str, str], body: bytes,
+              fetched_at: datetime = None, truncated: bool = False, content_hash: str = None):
+        """Append one response record and its index entry"""
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        date = fetched_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+        
+        http_lines = [f'HTTP/1.1 {status_code} {HTTP_REASONS.get(status_code, "")}']
+        http_lines += [f'{name}: {value}' for name, value in headers.items()
+                       if name.lower() not in HOP_HEADERS and value is not None]
+        http_lines.append(f'Content-Length: {len(body)}')
+        block = ('\r\n'.join(http_lines) + '\r\n\r\n').encode('utf-8') + body
+        
+        warc_headers = [
+            'WARC/1.1',
+            'WARC-Type: response',
+            f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+            f'WARC-Date: {date}',
+            f'WARC-Target-URI: {url}',
+            'Content-Type: application/http; msgtype=response',
+            f'Content-Length: {len(block)}'
+        ]
+        if content_hash:
+            warc_headers.append(f'WARC-Payload-Digest: sha256:{content_hash}')
+        if truncated:
+            warc_headers.append('WARC-Truncated: length')
+        record = ('\r\n'.join(warc_headers) + '\r\n\r\n').encode('utf-8') + block + b'\r\n\r\n'
+        member = gzip.compress(record, compresslevel=6)
+        
+        with self._lock:
+            name = self._target_file(len(member))
+            path = os.path.join(self.directory, name)
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                f.write(member)
+            entry = {
+                'url': url,
+                'file': name,
+                'offset': offset,
+                'length': len(member),
+                'status_code': status_code,
+                'date': date,
+                'content_hash': content_hash,
+                'truncated': truncated
+            }
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            if self._index is not None:
+                self._index[url] = entry
+            self.stats['written'] += 1
+            self.stats['bytes'] += len(member)
+    
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """URL -> latest index entry, read once"""
+        with self._lock:
+            if self._index is None:
+                index = {}
+                if os.path.exists(self.index_file):
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                index[entry['url']] = entry
+                self._index = index
+            return self._index
+    
+    def urls(self) -> Iterator[str]:
+        """Every archived URL, in first-archived order"""
+        return iter(list(self._load_index()))
+    
+    def read(self, url: str) -> Dict[str, Any]:
+        """Return the latest archived response for a URL"""
+        entry = self._load_index().get(url)
+        if entry is None:
+            raise LookupError(f"Not in archive: {url}")
+        
+        with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+            f.seek(entry['offset'])
+            record = gzip.decompress(f.read(entry['length']))
+        
+        _, block = record.split(b'\r\n\r\n', 1)
+        head, body = block.split(b'\r\n\r\n', 1)
+        lines = head.decode('utf-8', errors='replace').split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip()] = value.strip()
+        body = body[:int(headers.get('Content-Length', len(body)))]
+        
+        with self._lock:
+            self.stats['read'] += 1
+        return {
+            'url': url,
+            'status_code': int(lines[0].split()[1]),
+            'headers': headers,
+            'content': body,
+            'fetched_at': entry['date'],
+            'content_hash': entry.get('content_hash'),
+            'truncated': entry.get('truncated', False)
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return record counters"""
+        with self._lock:
+            return dict(self.stats)
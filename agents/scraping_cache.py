@@ -0,0 +1,186 @@
+"""
+Scraping Cache - Persistent caches for the scraping agent
+Stores response bodies with their ETag / Last-Modified validators and
+extraction results keyed by body hash in SQLite, evicting the least
+recently used entries once their budgets are exceeded
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, Union
+
+from scraping_records import json_default
+
+
+class ResponseCache:
+    """Size-bounded on-disk response cache with LRU eviction"""
+    
+    def __init__(self, path: str = '.cache/scraping/http_cache.sqlite',
+                 max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB,
+                size INTEGER,
+                last_access REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)')
+        self._conn.commit()
+    
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a URL, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status_code, content_type, etag, last_modified, body FROM responses WHERE url = ?',
+                (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            'status_code': row[0],
+            'content_type': row[1],
+            'etag': row[2],
+            'last_modified': row[3],
+            'body': row[4]
+        }
+    
+    def validators(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """Build conditional request headers for a cached entry"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def touch(self, url: str):
+        """Mark an entry as recently used"""
+        with self._lock:
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+    
+    def put(self, url: str, body: bytes, status_code: int, content_type: str = '',
+            etag: str = None, last_modified: str = None):
+        """Store a response body with its validators"""
+        # Entries without validators could never be revalidated
+        if not etag and not last_modified:
+            return
+        if len(body) > self.max_bytes:
+            return
+        
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, status_code, content_type, etag, last_modified, body, len(body), time.time())
+            )
+            self.stats['stores'] += 1
+            self._evict()
+            self._conn.commit()
+    
+    def record(self, hit: bool):
+        """Count a lookup outcome"""
+        with self._lock:
+            self.stats['hits' if hit else 'misses'] += 1
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        rows = self._conn.execute('SELECT url, size FROM responses ORDER BY last_access').fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+            total -= size
+            self.stats['evictions'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'entries': entries,
+            'size_bytes': size,
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0
+        })
+        return stats
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
+
+
+class ExtractionStore:
+    """Persistent extraction results keyed by body hash and extraction options"""
+    
+    def __init__(self, path: str = '.cache/scraping/extractions.sqlite', max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                result TEXT,
+                last_access REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_extractions_access ON extractions (last_access)')
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored extraction for a key, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT result FROM extractions WHERE key = ?', (key,)).fetchone()
+            if not row:
+                return None
+            self._conn.execute('UPDATE extractions SET last_access = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+    
+    def put(self, key: str, result: Union[Dict[str, Any], str]):
+        """Store an extraction (or its JSON), dropping the oldest entries beyond max_entries"""
+        if not isinstance(result, str):
+            result = json.dumps(result, ensure_ascii=False, default=json_default)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO extractions VALUES (?, ?, ?)',
+                (key, result, time.time())
+            )
+            excess = self._conn.execute('SELECT COUNT(*) FROM extractions').fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    'DELETE FROM extractions WHERE key IN '
+                    '(SELECT key FROM extractions ORDER BY last_access LIMIT ?)',
+                    (excess,)
+                )
+            self._conn.commit()
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,208 @@
+"""
+Scraping Charset - Encoding resolution for scraped responses
+Decides a page's encoding from its BOM, the Content-Type header, a bounded
+<meta>/XML declaration scan and per-host history, and only falls back to
+statistical detection when none of those settle it; the body is decoded
+exactly once
+"""
+
+import codecs
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+XML_ENCODING_RE = re.compile(rb'^\s*<\?xml[^>]+encoding\s*=\s*["\']([\w.:-]+)', re.I)
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16')
+]
+
+# Labels whose real-world content is a superset of the named codec, as browsers treat them
+CHARSET_ALIASES = {
+    'shift_jis': 'cp932',
+    'shift-jis': 'cp932',
+    'sjis': 'cp932',
+    'x-sjis': 'cp932',
+    'ms_kanji': 'cp932',
+    'csshiftjis': 'cp932',
+    'windows-31j': 'cp932',
+    'iso-8859-1': 'cp1252',
+    'latin1': 'cp1252',
+    'us-ascii': 'cp1252',
+    'ascii': 'cp1252',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'ks_c_5601-1987': 'cp949',
+    'euc-kr': 'cp949'
+}
+
+
+def normalize_charset(label) -> Optional[str]:
+    """Map a declared charset label to a Python codec name, or None if unknown"""
+    if isinstance(label, bytes):
+        label = label.decode('ascii', 'replace')
+    label = label.strip().strip('"\'').lower()
+    label = CHARSET_ALIASES.get(label, label)
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+def header_charset(content_type: str) -> Optional[str]:
+    """Codec named by the charset parameter of a Content-Type header, or None"""
+    match = HEADER_CHARSET_RE.search(content_type or '')
+    return normalize_charset(match.group(1)) if match else None
+
+
+def _whole_characters(prefix: bytes, lookback: int = 64) -> bytes:
+    """Trim a prefix so it does not end inside a multi-byte character
+    
+    A byte below 0x40 is never a lead or trail byte in the multi-byte
+    encodings detection can return, so the prefix is cut just after the last one.
+    """
+    for index in range(len(prefix) - 1, max(-1, len(prefix) - 1 - lookback), -1):
+        if prefix[index] < 0x40:
+            return prefix[:index + 1]
+    return prefix
+
+
+class CharsetResolver:
+    """Resolve and decode response bodies, remembering what each host used"""
+    
+    def __init__(self, scan_bytes: int = 4096, sample_bytes: int = 65536, max_hosts: int = 10000):
+        self.scan_bytes = scan_bytes
+        self.sample_bytes = sample_bytes
+        self.max_hosts = max_hosts
+        self.stats = {'bom': 0, 'header': 0, 'meta': 0, 'host': 0, 'utf-8': 0, 'detected': 0, 'fallback': 0}
+        self._hosts: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def declared(self, content_type: str, prefix: bytes) -> Tuple[Optional[str], Optional[str]]:
+        """Return (encoding, source) from the BOM, header or a bounded prefix scan"""
+        for bom, encoding in BOMS:
+            if prefix.startswith(bom):
+                return encoding, 'bom'
+        
+        encoding = header_charset(content_type)
+        if encoding:
+            return encoding, 'header'
+        
+        head = prefix[:self.scan_bytes]
+        match = XML_ENCODING_RE.search(head) or META_CHARSET_RE.search(head)
+        if match:
+            encoding = normalize_charset(match.group(1))
+            # A page cannot really be UTF-16 if its ASCII markup was readable
+            if encoding and not encoding.startswith('utf-16'):
+                return encoding, 'meta'
+        return None, None
+    
+    def decode(self, content: bytes, content_type: str = '', host: str = '') -> Tuple[str, str]:
+        """Decode a body once; return (text, encoding)"""
+        encoding, source = self.declared(content_type, content)
+        if encoding:
+            if source == 'meta':
+                self._remember(host, encoding)
+            return self._finish(content.decode(encoding, errors='replace'), encoding, source)
+        
+        # Undeclared pages: strict UTF-8, then what this host used before, then detection.
+        # Legacy multi-byte text is almost never valid UTF-8, so that check goes first
+        with self._lock:
+            hint = self._hosts.get(host)
+        for candidate, candidate_source in (('utf-8', 'utf-8'), (hint, 'host')):
+            if not candidate:
+                continue
+            try:
+                return self._finish(content.decode(candidate), candidate, candidate_source)
+            except UnicodeDecodeError:
+                continue
+        
+        encoding = self._detect(content)
+        if encoding:
+            self._remember(host, encoding)
+            return self._finish(content.decode(encoding, errors='replace'), encoding, 'detected')
+        return self._finish(content.decode('cp1252', errors='replace'), 'cp1252', 'fallback')
+    
+    def resolve_prefix(self, content_type: str, prefix: bytes, host: str = '') -> str:
+        """Pick the encoding for an incremental decoder from the first bytes of a body
+        
+        Follows decode() as far as a prefix allows: a declaration wins, then
+        UTF-8 if the prefix has non-ASCII bytes that are valid UTF-8, then
+        what this host used before, then detection on the prefix.
+        """
+        encoding, source = self.declared(content_type, prefix)
+        if encoding:
+            if source == 'meta':
+                self._remember(host, encoding)
+            return self._count(encoding, source)
+        
+        if not prefix.isascii():
+            try:
+                # The chunk may end inside a multi-byte sequence
+                codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+                return self._count('utf-8', 'utf-8')
+            except UnicodeDecodeError:
+                pass
+        with self._lock:
+            hint = self._hosts.get(host)
+        if hint:
+            return self._count(hint, 'host')
+        if prefix.isascii():
+            return self._count('utf-8', 'utf-8')
+        
+        encoding = self._detect(_whole_characters(prefix))
+        if encoding:
+            self._remember(host, encoding)
+            return self._count(encoding, 'detected')
+        return self._count('cp1252', 'fallback')
+    
+    def host_encoding(self, host: str) -> Optional[str]:
+        """Encoding this host's undeclared pages resolved to before, if any"""
+        with self._lock:
+            return self._hosts.get(host)
+    
+    def merge(self, counts: Dict[str, int], host: str = '', encoding: Optional[str] = None):
+        """Add resolutions made by another resolver, such as a parse worker's, to this one"""
+        with self._lock:
+            for source, count in counts.items():
+                self.stats[source] += count
+        if encoding:
+            self._remember(host, encoding)
+    
+    def _detect(self, content: bytes) -> Optional[str]:
+        """Statistical detection over a bounded sample, if charset_normalizer is installed"""
+        try:
+            from charset_normalizer import from_bytes
+        except ImportError:
+            return None
+        best = from_bytes(content[:self.sample_bytes]).best()
+        return normalize_charset(best.encoding) if best else None
+    
+    def _remember(self, host: str, encoding: str):
+        if not host:
+            return
+        with self._lock:
+            self._hosts[host] = encoding
+            self._hosts.move_to_end(host)
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+    
+    def _finish(self, text: str, encoding: str, source: str) -> Tuple[str, str]:
+        return text, self._count(encoding, source)
+    
+    def _count(self, encoding: str, source: str) -> str:
+        with self._lock:
+            self.stats[source] += 1
+        return encoding
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return how many bodies each resolution step settled"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['hosts'] = len(self._hosts)
+        return stats
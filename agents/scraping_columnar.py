@@ -0,0 +1,135 @@
+"""
+Scraping Columnar - Parquet / Arrow export for scraping results
+Flattens the nested links, images, meta and tables of each result into
+flat tables keyed by URL, written in row-group batches so large runs
+never sit in memory as one table
+"""
+
+import os
+from typing import Dict, Any, List
+
+# Column layout of every exported table; 'url' keys each row to its page
+COLUMNAR_SCHEMAS = {
+    'pages': [('url', 'string'), ('timestamp', 'string'), ('status_code', 'int32'),
+              ('title', 'string'), ('text_length', 'int64'), ('links_count', 'int32'),
+              ('images_count', 'int32'), ('tables_count', 'int32'), ('content_hash', 'string')],
+    'links': [('url', 'string'), ('text', 'string'), ('href', 'string'),
+              ('absolute_url', 'string'), ('is_external', 'bool_')],
+    'images': [('url', 'string'), ('src', 'string'), ('absolute_url', 'string'),
+               ('alt', 'string'), ('title', 'string')],
+    'meta': [('url', 'string'), ('name', 'string'), ('content', 'string')],
+    'tables': [('url', 'string'), ('table_index', 'int32'), ('row_index', 'int32'),
+               ('column_index', 'int32'), ('column', 'string'), ('value', 'string')]
+}
+
+COLUMNAR_FORMATS = ['parquet', 'arrow']
+
+
+class ColumnarExporter:
+    """Write scraping results as one Parquet or Arrow IPC file per flattened table"""
+    
+    def __init__(self, output_dir: str, timestamp: str, file_format: str = 'parquet',
+                 batch_rows: int = 50000, prefix: str = ''):
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unsupported columnar format: {file_format}")
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("Columnar export requires pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        
+        os.makedirs(output_dir, exist_ok=True)
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        # A prefix keeps the tables of streamed and delta runs apart from each other
+        name_prefix = f'{prefix}_' if prefix else ''
+        self.files = {
+            kind: os.path.join(output_dir, f'{name_prefix}{kind}_{timestamp}.{file_format}')
+            for kind in COLUMNAR_SCHEMAS
+        }
+        self.rows = {kind: 0 for kind in COLUMNAR_SCHEMAS}
+        self._schemas = {
+            kind: pyarrow.schema([(name, getattr(pyarrow, type_name)()) for name, type_name in columns])
+            for kind, columns in COLUMNAR_SCHEMAS.items()
+        }
+        self._buffers = {kind: self._empty_buffer(kind) for kind in COLUMNAR_SCHEMAS}
+        self._writers = {}
+        self._closed = False
+    
+    def _empty_buffer(self, kind: str) -> Dict[str, List[Any]]:
+        return {name: [] for name, _ in COLUMNAR_SCHEMAS[kind]}
+    
+    def write(self, result: Dict[str, Any]):
+        """Flatten one result into the table buffers, flushing full ones"""
+        if 'error' in result:
+            return
+        url = result['url']
+        
+        self._append('pages', url=url, timestamp=result.get('timestamp'),
+                     status_code=result.get('status_code'), title=result.get('title'),
+                     text_length=len(result.get('text', '')),
+                     links_count=len(result.get('links', [])),
+                     images_count=len(result.get('images', [])),
+                     tables_count=len(result.get('tables', [])),
+                     content_hash=result.get('content_hash'))
+        
+        for link in result.get('links', []):
+            self._append('links', url=url, text=link.get('text'), href=link.get('href'),
+                         absolute_url=link.get('absolute_url'), is_external=link.get('is_external'))
+        for image in result.get('images', []):
+            self._append('images', url=url, src=image.get('src'), absolute_url=image.get('absolute_url'),
+                         alt=image.get('alt'), title=image.get('title'))
+        for name, content in result.get('meta', {}).items():
+            self._append('meta', url=url, name=name, content=content)
+        
+        # Tables go long-format: one row per cell, since every table has its own columns
+        for table_index, table in enumerate(result.get('tables', [])):
+            headers = table.get('headers', [])
+            for row_index, row in enumerate(table.get('data', [])):
+                cells = row.items() if isinstance(row, dict) else (
+                    (headers[i] if i < len(headers) else None, value) for i, value in enumerate(row)
+                )
+                for column_index, (column, value) in enumerate(cells):
+                    self._append('tables', url=url, table_index=table_index, row_index=row_index,
+                                 column_index=column_index, column=column,
+                                 value=None if value is None else str(value))
+        
+        for kind, buffer in self._buffers.items():
+            if len(buffer['url']) >= self.batch_rows:
+                self._flush(kind)
+    
+    def _append(self, kind: str, **values):
+        buffer = self._buffers[kind]
+        for name in buffer:
+            buffer[name].append(values.get(name))
+    
+    def _flush(self, kind: str):
+        """Write a table's buffered rows as one record batch / row group"""
+        buffer = self._buffers[kind]
+        if kind not in self._writers:
+            self._writers[kind] = self._open_writer(kind)
+        if buffer['url']:
+            table = self._pa.Table.from_pydict(buffer, schema=self._schemas[kind])
+            self._writers[kind].write_table(table)
+            self.rows[kind] += table.num_rows
+        self._buffers[kind] = self._empty_buffer(kind)
+    
+    def _open_writer(self, kind: str):
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.files[kind], self._schemas[kind], compression='zstd')
+        return self._pa.ipc.new_file(self.files[kind], self._schemas[kind])
+    
+    def close(self) -> Dict[str, Any]:
+        """Flush remaining rows, close every file and describe what was written"""
+        if not self._closed:
+            # Tables without rows still get a file, so readers always find the schema
+            for kind in COLUMNAR_SCHEMAS:
+                self._flush(kind)
+                self._writers[kind].close()
+            self._closed = True
+        return {
+            'format': self.file_format,
+            'files': dict(self.files),
+            'rows': dict(self.rows)
+        }
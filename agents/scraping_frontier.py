@@ -0,0 +1,168 @@
+"""
+Scraping Frontier - URL frontier for breadth-first crawls
+Deduplicates discovered URLs by their normalized form with a Bloom filter
+and hands them out, as discovered, in depth-then-priority order within
+crawl limits
+"""
+
+import hashlib
+import heapq
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that only track campaigns and never change page content
+TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'yclid'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str, strip_tracking: bool = True) -> str:
+    """Canonicalize a URL so trivially different spellings deduplicate"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    
+    netloc = host
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{host}:{parsed.port}'
+    if parsed.username:
+        credentials = parsed.username + (f':{parsed.password}' if parsed.password else '')
+        netloc = f'{credentials}@{netloc}'
+    
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    if strip_tracking:
+        query = [(key, value) for key, value in query
+                 if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS]
+    query.sort()
+    
+    # Fragments never reach the server
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, urlencode(query), ''))
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set for seen-URL checks
+    
+    Memory stays constant regardless of how many URLs are added; a false
+    positive (rate set by error_rate at the given capacity) only means a
+    URL is treated as already seen.
+    """
+    
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.0001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        # Double hashing gives k independent-enough positions from one digest
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+    
+    def add(self, item: str) -> bool:
+        """Add an item; return True if it was not already present"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+    
+    def __contains__(self, item: str) -> bool:
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+
+class CrawlFrontier:
+    """Breadth-first crawl frontier with depth, page and scope limits"""
+    
+    def __init__(self, max_depth: int = 2, max_pages: int = 1000,
+                 same_domain: bool = True, allowed_prefixes: List[str] = None,
+                 priority: Callable[[str, int], float] = None,
+                 seen_capacity: int = 1000000):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_domain = same_domain
+        self.allowed_prefixes = [normalize_url(prefix) for prefix in allowed_prefixes or []]
+        self.priority = priority
+        self.seen = BloomFilter(seen_capacity)
+        self.allowed_hosts = set()
+        self.dispatched = 0
+        self.dropped = 0
+        self._heap: List[Tuple[int, float, int, str]] = []
+        self._sequence = 0
+    
+    def add_seed(self, url: str) -> bool:
+        """Queue a start URL and admit its host when crawling one domain"""
+        self.allowed_hosts.add(urlparse(normalize_url(url)).netloc)
+        return self.add(url, 0)
+    
+    def add(self, url: str, depth: int) -> bool:
+        """Queue a discovered URL if it is in scope and not seen yet
+        
+        Scope and dedupe checks use the normalized URL, but the URL is
+        fetched as written: servers may treat case, parameter order or
+        tracking parameters as significant.
+        """
+        if depth > self.max_depth:
+            return False
+        # Everything queued beyond the page budget would never be fetched
+        if self.dispatched + len(self._heap) >= self.max_pages:
+            self.dropped += 1
+            return False
+        
+        url = url.strip()
+        key = normalize_url(url)
+        parsed = urlparse(key)
+        if parsed.scheme not in ('http', 'https'):
+            return False
+        if self.same_domain and parsed.netloc not in self.allowed_hosts:
+            return False
+        if self.allowed_prefixes and not any(key.startswith(prefix) for prefix in self.allowed_prefixes):
+            return False
+        if not self.seen.add(key):
+            return False
+        
+        # Shallower pages first, then higher priority, then discovery order
+        priority = self.priority(url, depth) if self.priority else 0.0
+        heapq.heappush(self._heap, (depth, -priority, self._sequence, url))
+        self._sequence += 1
+        return True
+    
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """Return the next (url, depth) to fetch, or None when done"""
+        if not self._heap or self.dispatched >= self.max_pages:
+            return None
+        depth, _, _, url = heapq.heappop(self._heap)
+        self.dispatched += 1
+        return url, depth
+    
+    def pop_batch(self, size: int) -> List[Tuple[str, int]]:
+        """Return up to size URLs in frontier order"""
+        batch = []
+        while len(batch) < size:
+            item = self.pop()
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return frontier counters for reporting"""
+        return {
+            'dispatched': self.dispatched,
+            'queued': len(self._heap),
+            'dropped': self.dropped,
+            'seen': self.seen.count
+        }
@@ -0,0 +1,86 @@
+"""
+Scraping Index - Record indexes for incremental scraping runs
+Maps each URL to the file and record position holding its latest
+result, so unchanged pages can point at earlier runs instead of being
+written again
+"""
+
+import json
+import os
+from typing import Dict, Any, Iterator, Optional
+
+
+def _iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a scraped_data .json array or .jsonl file"""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def load_index(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load URL entries from a previous index or a full scraped_data output
+    
+    Entry file paths are returned as absolute paths.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and 'records' in data:
+            entries = {}
+            for url, entry in data['records'].items():
+                entry = dict(entry)
+                entry['file'] = os.path.normpath(os.path.join(base_dir, entry['file']))
+                entries[url] = entry
+            return entries
+    
+    # A complete run: every successful record lives in this file
+    entries = {}
+    for position, record in enumerate(_iter_records(path)):
+        if 'error' in record or 'url' not in record:
+            continue
+        entries[record['url']] = {
+            'file': os.path.abspath(path),
+            'record': position,
+            'content_hash': record.get('content_hash'),
+            'etag': record.get('etag'),
+            'last_modified': record.get('last_modified')
+        }
+    return entries
+
+
+def write_index(path: str, entries: Dict[str, Dict[str, Any]], previous: Optional[str] = None,
+                summary: Dict[str, Any] = None):
+    """Write an index whose file paths are relative to the index itself"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    records = {}
+    for url, entry in entries.items():
+        entry = dict(entry)
+        entry['file'] = os.path.relpath(entry['file'], base_dir)
+        records[url] = entry
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'format': 'scraped-index-v1',
+            'previous': os.path.abspath(previous) if previous else None,
+            'summary': summary or {},
+            'records': records
+        }, f, indent=2, ensure_ascii=False)
+
+
+def iter_indexed_results(index_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the current result for every URL in an index, reading each file once"""
+    wanted: Dict[str, Dict[int, str]] = {}
+    for url, entry in load_index(index_path).items():
+        wanted.setdefault(entry['file'], {})[entry['record']] = url
+    
+    for path, positions in wanted.items():
+        for position, record in enumerate(_iter_records(path)):
+            if position in positions:
+                yield record
@@ -0,0 +1,130 @@
+"""
+Scraping Records - Compact link and image records for the scraping agent
+Slotted mappings that store absolute URLs as an interned origin plus a
+path, so pages and crawls with many links share one string per host while
+still reading and serializing exactly like the plain result dicts
+"""
+
+import re
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Iterator, Tuple
+from urllib.parse import urljoin, urlsplit
+
+# scheme://netloc prefix of an absolute URL; the netloc is the raw text urlparse returns
+ORIGIN_RE = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://[^/?#]*')
+
+
+def split_origin(url: str) -> Tuple[str, str]:
+    """Split a URL into its interned scheme://netloc origin and the rest"""
+    match = ORIGIN_RE.match(url)
+    if not match:
+        # mailto:, javascript: and the like have no host
+        return '', url
+    return sys.intern(match.group(0)), url[match.end():]
+
+
+def origin_netloc(origin: str) -> str:
+    """The netloc part of an origin from split_origin"""
+    return origin[origin.find('://') + 3:] if origin else ''
+
+
+class BaseURL:
+    """A page URL parsed once and reused to resolve every link on the page"""
+    __slots__ = ('url', 'netloc')
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.netloc = urlsplit(url).netloc
+    
+    def resolve(self, reference: str) -> Tuple[str, str, bool]:
+        """Return (origin, path, is_external) of a reference resolved against the page"""
+        absolute_url = urljoin(self.url, reference)
+        origin, path = split_origin(absolute_url)
+        return origin, path, origin_netloc(origin) != self.netloc
+    
+    def absolute(self, reference: str) -> str:
+        return urljoin(self.url, reference)
+    
+    def is_external(self, absolute_url: str) -> bool:
+        return origin_netloc(split_origin(absolute_url)[0]) != self.netloc
+
+
+class CompactRecord(MutableMapping):
+    """Fixed-key mapping over slots; absolute_url is stored as origin + path"""
+    __slots__ = ('_origin', '_path')
+    KEYS: Tuple[str, ...] = ()
+    
+    @property
+    def absolute_url(self) -> str:
+        return self._origin + self._path
+    
+    @absolute_url.setter
+    def absolute_url(self, value: str):
+        self._origin, self._path = split_origin(value)
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def __delitem__(self, key: str):
+        raise TypeError(f'{type(self).__name__} keys cannot be removed')
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+    
+    def __len__(self) -> int:
+        return len(self.KEYS)
+    
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({dict(self)!r})'
+    
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self._state_slots())
+    
+    def __setstate__(self, state):
+        for slot, value in zip(self._state_slots(), state):
+            setattr(self, slot, value)
+    
+    @classmethod
+    def _state_slots(cls) -> Tuple[str, ...]:
+        return tuple(slot for klass in reversed(cls.__mro__) for slot in getattr(klass, '__slots__', ()))
+
+
+class LinkRecord(CompactRecord):
+    """One anchor; reads and serializes as {'text', 'href', 'absolute_url', 'is_external'}"""
+    __slots__ = ('text', 'href', 'is_external')
+    KEYS = ('text', 'href', 'absolute_url', 'is_external')
+    
+    def __init__(self, text: str, href: str, origin: str, path: str, is_external: bool):
+        self.text = text
+        self.href = href
+        self._origin = origin
+        self._path = path
+        self.is_external = is_external
+
+
+class ImageRecord(CompactRecord):
+    """One image; reads and serializes as {'src', 'absolute_url', 'alt', 'title'}"""
+    __slots__ = ('src', 'alt', 'title')
+    KEYS = ('src', 'absolute_url', 'alt', 'title')
+    
+    def __init__(self, src: str, origin: str, path: str, alt: str, title: str):
+        self.src = src
+        self._origin = origin
+        self._path = path
+        self.alt = alt
+        self.title = title
+
+
+def json_default(value: Any) -> Any:
+    """json.dump(s) default hook that writes compact records as plain objects"""
+    if isinstance(value, CompactRecord):
+        return dict(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -0,0 +1,191 @@
+"""
+Scraping Robots - robots.txt rules and sitemap discovery for the scraping agent
+Keeps parsed robots.txt files per host with a TTL so every fetch can be
+checked cheaply, and streams sitemaps (plain, gzipped and sitemap indexes)
+without building a DOM
+"""
+
+import gzip
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional
+from urllib.parse import urlparse, urljoin
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+# RFC 9309: crawlers may ignore anything past the first 500 KiB
+MAX_ROBOTS_BYTES = 500 * 1024
+# Unreachable robots.txt files are retried sooner than the normal TTL
+ERROR_TTL = 300
+GZIP_CONTENT_TYPES = ('application/gzip', 'application/x-gzip')
+# Elements from extensions such as image:loc live in other namespaces
+SITEMAP_NAMESPACES = ('', 'http://www.sitemaps.org/schemas/sitemap/0.9',
+                      'http://www.google.com/schemas/sitemap/0.9')
+
+
+def _sitemap_name(tag: str) -> Optional[str]:
+    """Local name of a sitemap protocol element, or None for extension elements"""
+    namespace, _, name = tag[1:].rpartition('}') if tag.startswith('{') else ('', '', tag)
+    return name if namespace in SITEMAP_NAMESPACES else None
+
+
+class RobotsCache:
+    """Per-host robots.txt rules shared by every fetch of an agent"""
+    
+    def __init__(self, session: requests.Session, scheduler=None, user_agent: str = '*',
+                 ttl: float = 86400, max_hosts: int = 10000):
+        self.session = session
+        self.scheduler = scheduler
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.max_hosts = max_hosts
+        self.stats = {'fetches': 0, 'hits': 0, 'blocked': 0}
+        self._entries: OrderedDict = OrderedDict()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def _origin(self, url: str) -> str:
+        parsed = urlparse(url)
+        return f'{parsed.scheme}://{parsed.netloc}'
+    
+    def rules(self, url: str) -> RobotFileParser:
+        """Return the parsed robots.txt for a URL's host, fetching it when stale"""
+        origin = self._origin(url)
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry and entry['expires'] > time.monotonic():
+                self._entries.move_to_end(origin)
+                self.stats['hits'] += 1
+                return entry['parser']
+            host_lock = self._host_locks.setdefault(origin, threading.Lock())
+        
+        # One fetch per host, however many threads ask at once
+        with host_lock:
+            with self._lock:
+                entry = self._entries.get(origin)
+                if entry and entry['expires'] > time.monotonic():
+                    self.stats['hits'] += 1
+                    return entry['parser']
+            
+            parser, ttl = self._load(origin)
+            with self._lock:
+                self._entries[origin] = {'parser': parser, 'expires': time.monotonic() + ttl}
+                self._entries.move_to_end(origin)
+                while len(self._entries) > self.max_hosts:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._host_locks.pop(evicted, None)
+            return parser
+    
+    def _load(self, origin: str):
+        """Fetch and parse robots.txt; return (parser, ttl)"""
+        robots_url = f'{origin}/robots.txt'
+        parser = RobotFileParser(robots_url)
+        with self._lock:
+            self.stats['fetches'] += 1
+        
+        try:
+            if self.scheduler:
+                response = self.scheduler.request(self.session, robots_url, timeout=10, stream=True)
+            else:
+                response = self.session.get(robots_url, timeout=10, stream=True)
+            try:
+                status = response.status_code
+                body = response.raw.read(MAX_ROBOTS_BYTES, decode_content=True) if status == 200 else b''
+            finally:
+                response.close()
+        except requests.RequestException:
+            # An unreachable robots.txt means nothing may be fetched for now
+            parser.disallow_all = True
+            return parser, min(self.ttl, ERROR_TTL)
+        
+        # RFC 9309 2.3.1.3: any 4xx, 401 and 403 included, means there are no rules
+        if 400 <= status < 500:
+            parser.allow_all = True
+        elif status >= 500:
+            parser.disallow_all = True
+            return parser, min(self.ttl, ERROR_TTL)
+        else:
+            parser.parse(body.decode('utf-8', errors='replace').splitlines())
+        return parser, self.ttl
+    
+    def allowed(self, url: str) -> bool:
+        """Whether robots.txt lets this agent fetch the URL"""
+        allowed = self.rules(url).can_fetch(self.user_agent, url)
+        if not allowed:
+            with self._lock:
+                self.stats['blocked'] += 1
+        return allowed
+    
+    def crawl_delay(self, url: str) -> Optional[float]:
+        """Crawl-delay for the URL's host, if robots.txt sets one"""
+        delay = self.rules(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+    
+    def sitemaps(self, url: str) -> List[str]:
+        """Sitemap URLs announced in the host's robots.txt"""
+        return self.rules(url).site_maps() or []
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return fetch, hit and block counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['hosts'] = len(self._entries)
+        return stats
+
+
+def iter_sitemap(session: requests.Session, sitemap_url: str, scheduler=None,
+                 max_depth: int = 3, seen: set = None) -> Iterator[Dict[str, Optional[str]]]:
+    """Stream {'loc', 'lastmod'} entries from a sitemap, following sitemap indexes
+    
+    Entries are discarded as soon as they are read, so 50,000-entry
+    sitemaps never sit in memory as a tree. seen collects sitemap URLs
+    already visited and can be shared across calls.
+    """
+    seen = seen if seen is not None else set()
+    if sitemap_url in seen or max_depth < 0:
+        return
+    seen.add(sitemap_url)
+    
+    if scheduler:
+        response = scheduler.request(session, sitemap_url, timeout=30, stream=True)
+    else:
+        response = session.get(sitemap_url, timeout=30, stream=True)
+    
+    children = []
+    try:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        stream = response.raw
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if urlparse(sitemap_url).path.endswith('.gz') or content_type in GZIP_CONTENT_TYPES:
+            stream = gzip.GzipFile(fileobj=stream)
+        
+        root = None
+        fields: Dict[str, Optional[str]] = {}
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            name = _sitemap_name(element.tag)
+            if name in ('loc', 'lastmod'):
+                fields[name] = (element.text or '').strip()
+            elif name in ('url', 'sitemap'):
+                loc = fields.get('loc')
+                if loc:
+                    if name == 'sitemap':
+                        # Nested sitemaps are read after this stream is closed
+                        children.append(urljoin(sitemap_url, loc))
+                    else:
+                        yield {'loc': loc, 'lastmod': fields.get('lastmod')}
+                fields = {}
+                # Drop finished entries from the root so memory stays flat
+                root.clear()
+    finally:
+        response.close()
+    
+    for child in children:
+        yield from iter_sitemap(session, child, scheduler, max_depth - 1, seen)
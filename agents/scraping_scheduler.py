@@ -0,0 +1,164 @@
+"""
+Scraping Scheduler - Per-host politeness and retry layer for the scraping agent
+Spaces out requests to each host, honors Retry-After, retries transient
+failures with jittered exponential backoff and keeps per-host statistics
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+import requests
+
+# Responses worth another attempt after a pause
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+class HostScheduler:
+    """Per-host rate limits, Retry-After handling and retries with backoff"""
+    
+    def __init__(self, min_interval: float = 0.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 retry_after_max: float = 120.0, latency_window: int = 1000):
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # A Retry-After longer than this is not waited out; the response is returned instead
+        self.retry_after_max = retry_after_max
+        self.latency_window = latency_window
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def _host(self, host: str) -> Dict[str, Any]:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = {
+                    'lock': threading.Lock(),
+                    'next_allowed': 0.0,
+                    'requests': 0,
+                    'retries': 0,
+                    'errors': 0,
+                    'gave_up': 0,
+                    'min_interval': 0.0,
+                    'latencies': deque(maxlen=self.latency_window)
+                }
+                self._hosts[host] = state
+            return state
+    
+    def _wait_turn(self, state: Dict[str, Any]):
+        """Reserve the next request slot for a host and sleep until it opens"""
+        with state['lock']:
+            now = time.monotonic()
+            slot = max(now, state['next_allowed'])
+            state['next_allowed'] = slot + max(self.min_interval, state['min_interval'])
+        if slot > now:
+            time.sleep(slot - now)
+    
+    def set_host_interval(self, host: str, interval: float):
+        """Space requests to one host further apart, e.g. for a robots.txt Crawl-delay"""
+        state = self._host(host)
+        with state['lock']:
+            state['min_interval'] = interval
+    
+    def _defer(self, state: Dict[str, Any], delay: float):
+        """Hold back every request to a host for at least delay seconds"""
+        with state['lock']:
+            state['next_allowed'] = max(state['next_allowed'], time.monotonic() + delay)
+    
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        """Seconds requested by a Retry-After header, if any"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    
+    def request(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """GET a URL politely, retrying transient failures"""
+        state = self._host(urlparse(url).netloc)
+        
+        for attempt in range(self.max_retries + 1):
+            self._wait_turn(state)
+            started = time.monotonic()
+            try:
+                response = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                with state['lock']:
+                    state['errors'] += 1
+                if attempt == self.max_retries:
+                    raise
+                with state['lock']:
+                    state['retries'] += 1
+                self._defer(state, self._backoff(attempt))
+                continue
+            
+            with state['lock']:
+                state['requests'] += 1
+                state['latencies'].append(time.monotonic() - started)
+            
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_after(response)
+                # The whole host backs off, not just this URL, for as long as the server asked
+                if delay is not None and delay > self.retry_after_max:
+                    self._defer(state, delay)
+                    with state['lock']:
+                        state['gave_up'] += 1
+                    return response
+                if delay is None:
+                    delay = self._backoff(attempt)
+                with state['lock']:
+                    state['retries'] += 1
+                self._defer(state, delay)
+                response.close()
+                continue
+            
+            return response
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return request, retry and latency figures per host"""
+        stats = {}
+        with self._lock:
+            hosts = list(self._hosts.items())
+        for host, state in hosts:
+            with state['lock']:
+                latencies = sorted(state['latencies'])
+                stats[host] = {
+                    'requests': state['requests'],
+                    'retries': state['retries'],
+                    'errors': state['errors'],
+                    'gave_up': state['gave_up'],
+                    'latency_avg': round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+                    'latency_p50': round(_percentile(latencies, 0.50), 4),
+                    'latency_p95': round(_percentile(latencies, 0.95), 4),
+                    'latency_max': round(latencies[-1], 4) if latencies else 0.0
+                }
+        return stats
@@ -0,0 +1,232 @@
+"""
+Scraping Tables - HTML table engine for the scraping agent
+Expands colspan/rowspan into a rectangular grid, builds a pandas
+DataFrame from it and infers numeric and date columns in vectorized
+passes; a JSON-safe records view is derived from the typed frame
+"""
+
+import warnings
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup, Tag
+
+# Browsers clamp spans to these limits as well
+MAX_COLSPAN = 1000
+MAX_ROWSPAN = 65534
+ROW_GROUPS = ('thead', 'tbody', 'tfoot')
+CELL_TAGS = ('td', 'th')
+
+# Thousands separators, currency and percent signs around numeric cells
+NUMERIC_NOISE_RE = r'[,\s¥$€£円%]'
+ACCOUNTING_NEGATIVE_RE = r'^\((.*)\)$'
+JAPANESE_DATE_RE = r'(\d{4})年\s*(\d{1,2})月\s*(\d{1,2})日'
+# Largest magnitude below which every integer is exact in float64
+MAX_EXACT_INTEGER = 2 ** 53
+# Cells that stand for a missing value (compared after NFKC and lower-casing);
+# they become NA in typed columns instead of blocking the inference
+PLACEHOLDERS = ['-', '--', '—', '–', '―', '‐', 'ー', '…', '...', '*', 'n/a', 'na', 'n.a.', 'null', 'none']
+
+
+def _span(cell: Tag, attribute: str, limit: int) -> int:
+    try:
+        value = int(cell.get(attribute, 1))
+    except (TypeError, ValueError):
+        return 1
+    return min(max(value, 1), limit)
+
+
+def _own_rows(table: Tag) -> Iterator[Tag]:
+    """Rows of this table in document order, leaving out rows of nested tables"""
+    # Walking children directly is much cheaper than find_all on large tables
+    for child in table.children:
+        if not isinstance(child, Tag):
+            continue
+        if child.name == 'tr':
+            yield child
+        elif child.name in ROW_GROUPS:
+            for row in child.children:
+                if isinstance(row, Tag) and row.name == 'tr':
+                    yield row
+
+
+def table_grid(table: Tag) -> Tuple[List[List[Optional[str]]], int]:
+    """Expand a table into rows of cell text with spans repeated
+    
+    Returns (grid, header_rows) where the first header_rows rows come
+    from <thead> or are made only of <th> cells.
+    """
+    grid = []
+    header_rows = 0
+    # column -> [rows still covered, text] for cells spanning downwards
+    pending: Dict[int, List[Any]] = {}
+    
+    def take(column: int) -> str:
+        entry = pending[column]
+        entry[0] -= 1
+        if entry[0] == 0:
+            del pending[column]
+        return entry[1]
+    
+    for row in _own_rows(table):
+        cells = [cell for cell in row.children if isinstance(cell, Tag) and cell.name in CELL_TAGS]
+        if not cells and not pending:
+            continue
+        
+        values = []
+        column = 0
+        for cell in cells:
+            while column in pending:
+                values.append(take(column))
+                column += 1
+            text = cell.get_text().strip()
+            rowspan = _span(cell, 'rowspan', MAX_ROWSPAN)
+            for _ in range(_span(cell, 'colspan', MAX_COLSPAN)):
+                values.append(text)
+                if rowspan > 1:
+                    pending[column] = [rowspan - 1, text]
+                column += 1
+        while pending and column <= max(pending):
+            values.append(take(column) if column in pending else None)
+            column += 1
+        
+        is_header = cells and (row.parent.name == 'thead' or all(cell.name == 'th' for cell in cells))
+        if is_header and header_rows == len(grid):
+            header_rows += 1
+        grid.append(values)
+    
+    return grid, header_rows
+
+
+def _column_names(header_grid: List[List[Optional[str]]], width: int) -> List[str]:
+    """Join stacked header rows per column and make the names unique"""
+    names = []
+    seen: Dict[str, int] = {}
+    for index in range(width):
+        parts = []
+        for row in header_grid:
+            part = row[index] if index < len(row) else None
+            if part and part not in parts:
+                parts.append(part)
+        name = ' / '.join(parts) or f'column_{index + 1}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}_{seen[name]}'
+        else:
+            seen[name] = 1
+        names.append(name)
+    return names
+
+
+def infer_column_types(frame: pd.DataFrame) -> pd.DataFrame:
+    """Convert columns whose every non-empty cell is a number or a date"""
+    typed = {}
+    for name in frame.columns:
+        typed[name] = _infer_column(frame[name])
+    result = pd.DataFrame(typed, index=frame.index)
+    result.attrs.update(frame.attrs)
+    return result
+
+
+def _infer_column(column: pd.Series) -> pd.Series:
+    text = column.astype('string').str.normalize('NFKC').str.strip()
+    present = text.notna() & (text != '') & ~text.str.lower().isin(PLACEHOLDERS)
+    if not present.any():
+        return column
+    values = text[present]
+    
+    numbers = pd.to_numeric(
+        values.str.replace(ACCOUNTING_NEGATIVE_RE, r'-\1', regex=True)
+              .str.replace(NUMERIC_NOISE_RE, '', regex=True),
+        errors='coerce'
+    )
+    if numbers.notna().all():
+        # 'inf' cells have no JSON form, and whole numbers past 2**53 (IDs, account
+        # numbers) cannot survive float64 or may overflow Int64, so such columns stay text
+        if not np.isfinite(numbers.to_numpy(dtype='float64')).all():
+            return column
+        integral = (numbers % 1 == 0).all()
+        if integral and (numbers.abs() >= MAX_EXACT_INTEGER).any():
+            return column
+        typed = pd.Series(pd.NA, index=column.index, dtype='Int64' if integral else 'Float64')
+        typed[present] = numbers.astype('Int64' if integral else 'Float64')
+        return typed
+    
+    # Plain words and short codes are never dates, however lenient the parser
+    if values.str.contains(r'\d').all() and (values.str.len() >= 6).all():
+        normalized = values.str.replace(JAPANESE_DATE_RE, r'\1-\2-\3', regex=True)
+        dates = _to_datetime(normalized)
+        if dates is not None:
+            typed = pd.Series(pd.NaT, index=column.index, dtype=dates.dtype)
+            typed[present] = dates
+            return typed
+    
+    return column
+
+
+def _to_datetime(values: pd.Series) -> Optional[pd.Series]:
+    """Parse with one inferred format first, then per value; None unless all parse"""
+    for date_format in (None, 'mixed'):
+        try:
+            # Failing to infer one format is expected here; 'mixed' is the fallback
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                dates = pd.to_datetime(values, errors='coerce', format=date_format)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        if dates.notna().all():
+            return dates
+    return None
+
+
+def table_to_frame(table: Tag, infer_types: bool = True) -> Optional[pd.DataFrame]:
+    """Build a DataFrame from a <table>, or None if it has no data rows"""
+    grid, header_rows = table_grid(table)
+    body = grid[header_rows:]
+    if not body:
+        return None
+    
+    width = max(len(row) for row in grid)
+    frame = pd.DataFrame(
+        [row + [None] * (width - len(row)) for row in body],
+        columns=_column_names(grid[:header_rows], width) if header_rows else None,
+        dtype=object
+    )
+    frame.attrs['has_header'] = bool(header_rows)
+    return infer_column_types(frame) if infer_types else frame
+
+
+def frame_to_view(frame: pd.DataFrame) -> Dict[str, Any]:
+    """JSON-safe records view of a typed table frame"""
+    columns = []
+    for name in frame.columns:
+        column = frame[name]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            is_date = (column.dropna() == column.dropna().dt.normalize()).all()
+            column = column.dt.strftime('%Y-%m-%d' if is_date else '%Y-%m-%dT%H:%M:%S')
+        columns.append(column.astype(object).where(column.notna(), None).tolist())
+    
+    rows = [list(values) for values in zip(*columns)]
+    if frame.attrs.get('has_header'):
+        headers = [str(name) for name in frame.columns]
+        data = [dict(zip(headers, row)) for row in rows]
+    else:
+        headers = []
+        data = rows
+    return {
+        'headers': headers,
+        'dtypes': {str(name): str(dtype) for name, dtype in frame.dtypes.items()},
+        'data': data
+    }
+
+
+def read_html_tables(html: str, parser: str = 'lxml', infer_types: bool = True) -> List[pd.DataFrame]:
+    """Every non-empty table of a page as a DataFrame, in document order"""
+    soup = BeautifulSoup(html, parser)
+    frames = []
+    for table in soup.find_all('table'):
+        frame = table_to_frame(table, infer_types)
+        if frame is not None:
+            frames.append(frame)
+    return frames
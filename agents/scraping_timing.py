@@ -0,0 +1,100 @@
+"""
+Scraping Timing - Per-stage timing for the scraping agent
+Accumulates the time spent in individual extraction helpers and
+aggregates per-page stage timings and byte counts into percentile and
+histogram reports per batch
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Optional
+
+from scraping_scheduler import _percentile
+
+# Upper bounds (seconds) of the histogram buckets; slower samples go to the last one
+HISTOGRAM_BOUNDS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+def _untimed(name: str, func: Callable, *args):
+    return func(*args)
+
+
+def stage_timer(timings: Optional[Dict[str, float]]) -> Callable:
+    """Return call(name, func, *args) that adds func's run time to timings[name]
+    
+    With timings None the returned callable just calls func, so
+    instrumented code pays almost nothing when timing is off.
+    """
+    if timings is None:
+        return _untimed
+    
+    def timed(name: str, func: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+    return timed
+
+
+def _bucket_label(index: int) -> str:
+    if index == len(HISTOGRAM_BOUNDS):
+        return f'>{HISTOGRAM_BOUNDS[-1]:g}s'
+    return f'<={HISTOGRAM_BOUNDS[index]:g}s'
+
+
+class TimingCollector:
+    """Per-batch percentile and histogram report over page stage timings"""
+    
+    def __init__(self, window: int = 100000):
+        self.window = window
+        self.pages = 0
+        self._stages: Dict[str, deque] = {}
+        self._bytes: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+    
+    def _add(self, target: Dict[str, deque], prefix: str, values: Dict[str, Any]):
+        for name, value in values.items():
+            key = f'{prefix}.{name}' if prefix else name
+            if isinstance(value, dict):
+                self._add(target, key, value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                target.setdefault(key, deque(maxlen=self.window)).append(value)
+    
+    def record(self, timing: Dict[str, Any], byte_counts: Dict[str, int] = None):
+        """Add one page's nested timing (and byte counts) to the batch"""
+        with self._lock:
+            self.pages += 1
+            self._add(self._stages, '', timing)
+            if byte_counts:
+                self._add(self._bytes, '', byte_counts)
+    
+    def _summary(self, samples: deque, histogram: bool) -> Dict[str, Any]:
+        values = sorted(samples)
+        summary = {
+            'count': len(values),
+            'mean': round(sum(values) / len(values), 6),
+            'p50': round(_percentile(values, 0.50), 6),
+            'p95': round(_percentile(values, 0.95), 6),
+            'p99': round(_percentile(values, 0.99), 6),
+            'max': round(values[-1], 6)
+        }
+        if histogram:
+            counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+            for value in values:
+                counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+            summary['histogram'] = {_bucket_label(i): count for i, count in enumerate(counts) if count}
+        return summary
+    
+    def report(self) -> Dict[str, Any]:
+        """Percentiles per stage (seconds) and per byte counter"""
+        with self._lock:
+            return {
+                'pages': self.pages,
+                'stages': {name: self._summary(samples, True)
+                           for name, samples in sorted(self._stages.items())},
+                'bytes': {name: self._summary(samples, False)
+                          for name, samples in sorted(self._bytes.items())}
+            }
@@ -0,0 +1,9 @@
+"""
+Test configuration - Makes the agent modules importable
+The agents run as scripts from agents/ and import their siblings by plain name
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agents'))
@@ -0,0 +1,87 @@
+"""
+Parser conformance - Every extractor gives the same output on each installed tree builder
+Compares lxml and html5lib against html.parser on a sample page exercising
+every extractor and on common kinds of malformed markup
+"""
+
+import pytest
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+from scraping_agent import ScrapingAgent, PARSER_BACKENDS
+
+BASE_URL = 'https://example.com/page'
+REFERENCE_PARSER = 'html.parser'
+
+SAMPLE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title> Sample Page </title>
+<meta name="description" content="Conformance sample"><meta property="og:title" content="Sample">
+<script type="application/ld+json">{"@type": "Thing", "name": "sample"}</script>
+<script src="/static/app.js"></script><style>body { color: #333; }</style>
+</head><body>
+<h2>Second level</h2><h1>First <b>level</b></h1><h3>Third level</h3><h1>Another first</h1>
+<p>Some   body  text   spread
+over lines.</p>
+<a href="/relative">Relative</a> <a href="https://example.org/x">External</a> <a>No href</a> <a href="">Empty</a>
+<img src="/img.png" alt="Alt" title="Title"><img alt="No src">
+<table><thead><tr><th>A</th><th>B</th></tr></thead>
+<tbody><tr><td>1</td><td>2</td></tr><tr><td>3</td><td>4</td></tr></tbody></table>
+<table><tr><th>X</th><th>Y</th></tr><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>
+<form action="/search" method="post"><input name="q" required>
+<select name="s"><option>One</option><option> Two </option></select><textarea id="t"></textarea></form>
+<script>var answer = 42;</script>
+<!-- comment -->
+</body></html>
+"""
+
+# Broken markup real sites serve, where the tree builders still agree on the content
+MALFORMED_PAGES = {
+    'unclosed_p': "<html><head><title>T</title></head><body><p>one<p>two<p>three</body></html>",
+    'no_html_head': "<title>T</title><meta name=description content=d><h1>H</h1><p>text <a href=/a>a</a>",
+    'unquoted_upper': "<HTML><HEAD><TITLE>Up</TITLE></HEAD><BODY><A HREF=/x>X</A><IMG SRC=i.png ALT=I>"
+                      "<H2>h</H2></BODY></HTML>",
+    'stray_end_tags': "<html><body><div><p>stray </div></p> text &amp; more &nbsp; &copy 2024</body></html>",
+    'misnested': "<html><body><p><b>bold <i>both</b> italic</i></p></body></html>",
+    'unclosed_li': "<html><body><ul><li>one<li>two</ul><a href='/a'>A</a></body></html>",
+    'unclosed_body': "<html><head><title>T</title></head><body><h1>H</h1>"
+                     "<table><tr><th>a</th></tr><tr><td>1</td></tr></table>",
+    'entities': "<html><head><title>A &amp; B</title></head><body><p>5 &lt; 6 &#169; &#x41;</p>"
+                "<a href='/q?a=1&b=2'>q</a></body></html>"
+}
+
+
+def extract_all(agent: ScrapingAgent, html: str, parser: str):
+    """Run every extractor on one tree; extractors must not mutate it, so they share the soup"""
+    soup = BeautifulSoup(html, parser)
+    return {
+        'title': agent._extract_title(soup),
+        'meta': agent._extract_meta(soup),
+        'headers': agent._extract_headers(soup),
+        'links': agent._extract_links(soup, BASE_URL),
+        'images': agent._extract_images(soup, BASE_URL),
+        'tables': agent._extract_tables(soup),
+        'forms': agent._extract_forms(soup),
+        'scripts': agent._extract_scripts(soup),
+        'structured_data': agent._extract_structured_data(soup),
+        'custom': agent._extract_custom(soup, {'headings': 'h1', 'first_link': 'a[href]'}),
+        'text': agent._extract_text(soup),
+        'single_pass': agent._extract_single_pass(soup, BASE_URL)
+    }
+
+
+@pytest.fixture(scope='module')
+def agent():
+    return ScrapingAgent({'respect_robots': False})
+
+
+@pytest.mark.parametrize('parser', [name for name in PARSER_BACKENDS if name != REFERENCE_PARSER])
+@pytest.mark.parametrize('page', ['sample'] + list(MALFORMED_PAGES))
+def test_extractors_match_reference_parser(agent, parser, page):
+    if builder_registry.lookup(parser) is None:
+        pytest.skip(f"{parser} is not installed")
+    html = SAMPLE_HTML if page == 'sample' else MALFORMED_PAGES[page]
+    
+    expected = extract_all(agent, html, REFERENCE_PARSER)
+    actual = extract_all(agent, html, parser)
+    mismatches = [name for name in expected if actual[name] != expected[name]]
+    assert not mismatches, f"{parser} differs from {REFERENCE_PARSER} on {page}: {mismatches}"
@@ -0,0 +1,51 @@
+"""
+Scraping tables - Type inference on scraped table columns
+Numbers, dates and placeholders convert; values that cannot be typed
+losslessly stay text
+"""
+
+import pandas as pd
+
+from scraping_tables import infer_column_types, frame_to_view
+
+
+def infer(**columns):
+    return infer_column_types(pd.DataFrame(columns, dtype=object))
+
+
+def test_numeric_noise_and_placeholders():
+    typed = infer(amount=['1,000', '-', 'N/A', '－', '(5)', '¥2,500'])
+    assert str(typed['amount'].dtype) == 'Int64'
+    assert typed['amount'].tolist() == [1000, pd.NA, pd.NA, pd.NA, -5, 2500]
+
+
+def test_placeholders_kept_in_text_columns():
+    typed = infer(name=['x', '-', 'NA'])
+    assert typed['name'].tolist() == ['x', '-', 'NA']
+
+
+def test_integers_beyond_float_precision_stay_text():
+    cells = ['1', '99999999999999999999', '9007199254740993']
+    typed = infer(id=cells)
+    assert typed['id'].dtype == object
+    assert typed['id'].tolist() == cells
+
+
+def test_infinite_values_stay_text():
+    for cells in (['1', 'inf'], ['-inf', '2.5'], ['1e400', '3']):
+        typed = infer(value=cells)
+        assert typed['value'].dtype == object
+        assert typed['value'].tolist() == cells
+
+
+def test_large_finite_floats_and_safe_integers():
+    typed = infer(ratio=['1.5e300', '2.25'], count=['9007199254740991', '-3'])
+    assert str(typed['ratio'].dtype) == 'Float64'
+    assert str(typed['count'].dtype) == 'Int64'
+    assert typed['count'].tolist() == [9007199254740991, -3]
+
+
+def test_dates_in_records_view():
+    frame = infer(day=['2024-01-02', '2024年5月6日', 'n/a'])
+    frame.attrs['has_header'] = True
+    assert frame_to_view(frame)['data'] == [{'day': '2024-01-02'}, {'day': '2024-05-06'}, {'day': None}]